@@ -0,0 +1,221 @@
+# -*- coding: utf8 -*-
+"""
+Benchmarks for ffmpegwrapper.
+
+Run them with ``python bench.py``. Processes are started with the
+deterministic stand-in ``fake_ffmpeg.py``, so no real ffmpeg is needed.
+Use ``--json`` for machine readable results and name benchmarks to only
+run some of them, e.g. ``python bench.py --json argv reader``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+from io import BytesIO
+
+from ffmpegwrapper import FFmpeg, Input, Output, VideoCodec, AudioCodec, \
+    VideoFilter
+from ffmpegwrapper.frames import FrameReader, numpy
+from ffmpegwrapper.pool import FFmpegPool
+from ffmpegwrapper.reader import iter_lines
+from ffmpegwrapper.template import CommandTemplate
+
+
+FAKE_FFMPEG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'fake_ffmpeg.py')
+
+
+def fake_command(*parameters, **options):
+    """Build a command for the fake ffmpeg. `options` are passed as
+    ``-fake_<name> <value>``."""
+    input = Input(options.pop('input', '/old.mkv'))
+    output = Output(options.pop('output', '/new.mp4'), *parameters)
+    for name, value in sorted(options.items()):
+        input.add_parameter('-fake_' + name, str(value))
+    return FFmpeg(FAKE_FFMPEG, input, output)
+
+
+def sample_output(lines=20000):
+    """Build output which looks like the stderr of an encode."""
+    status = (b'frame= %5d fps= 25 q=28.0 size=    1024kB '
+              b'time=00:00:10.00 bitrate= 838.9kbits/s speed=1.00x\r')
+    log = b'[libx264 @ 0x1e2f3a0] frame I:1 Avg QP:20.50 size: 12345\n'
+    parts = []
+    for number in range(lines):
+        parts.append(status % number if number % 10 else log)
+    return b''.join(parts)
+
+
+def bytewise_lines(out):
+    """The reader used before the chunked one: one read per byte."""
+    line = bytearray()
+    while True:
+        byte = out.read(1)
+        if byte == b'':
+            break
+        line += byte
+        if byte in (b'\n', b'\r'):
+            yield line.decode('utf8')
+            line = bytearray()
+
+
+def bench_reader(repeat=3):
+    data = sample_output()
+    results = []
+    seconds = {}
+    for name, reader in [('bytewise', bytewise_lines),
+                         ('chunked', iter_lines)]:
+        timer = timeit.Timer(lambda: list(reader(BytesIO(data))))
+        seconds[name] = min(timer.repeat(repeat, 1))
+        results.append((name, len(data) / seconds[name] / 1e6, 'MB/s'))
+    results.append(('speedup', seconds['bytewise'] / seconds['chunked'],
+                    'x'))
+    return results
+
+
+def sample_command(input='/old.mkv', output='/new.mp4'):
+    """Build a command tree of typical size."""
+    videofilter = VideoFilter().yadif().scale(1280, 720).unsharp(5, 5, 1)
+    video = VideoCodec('libx264').bitrate('3000k').max_bitrate('4000k') \
+        .buffer_size('8000k').fps(25).preset('medium')
+    audio = AudioCodec('aac').bitrate('128k').channels(2).frequence(48000)
+    output = Output(output, videofilter, video, audio).overwrite()
+    return FFmpeg('ffmpeg', Input(input), output)
+
+
+def bench_compile(number=20000):
+    ffmpeg = sample_command()
+    codec = ffmpeg[-1][1]
+
+    def rebuild():
+        codec.name = 'libx264'
+        return ffmpeg.compile()
+
+    template = CommandTemplate(sample_command('${input}', '${output}'))
+
+    def instantiate():
+        return template(input='/old.mkv', output='/new.mp4').compile()
+
+    results = []
+    for name, build in [('compile', ffmpeg.compile),
+                        ('rebuild', rebuild),
+                        ('construct', lambda: sample_command().compile()),
+                        ('template', instantiate)]:
+        seconds = min(timeit.repeat(build, repeat=3, number=number))
+        results.append((name, seconds / number * 1e6, 'us'))
+    return results
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def bench_latency(lines=200, rate=200):
+    """Time from a line written by the process until readlines()
+    yields it."""
+    ffmpeg = fake_command(lines=lines, rate=rate)
+    ffmpeg[0].add_parameter('-fake_timestamps', None)
+    latencies = []
+    for line in ffmpeg.run().readlines():
+        stamp = line.rpartition(' t=')[2]
+        if stamp and stamp[0].isdigit():
+            latencies.append((time.time() - float(stamp)) * 1e3)
+    return [('median', percentile(latencies, 0.5), 'ms'),
+            ('p95', percentile(latencies, 0.95), 'ms'),
+            ('max', max(latencies), 'ms')]
+
+
+def bench_pool(jobs=16, workers=(1, 2, 4, 8)):
+    """Throughput of an FFmpegPool with jobs of about 0.1 seconds."""
+    results = []
+    for count in workers:
+        commands = [fake_command(lines=20, rate=200) for _ in range(jobs)]
+        start = time.time()
+        with FFmpegPool(max_workers=count) as pool:
+            list(pool.map(commands))
+        results.append(('workers=%d' % count,
+                        jobs / (time.time() - start), 'jobs/s'))
+    return results
+
+
+def bench_spawn(number=20):
+    """Cost of starting a process through FFmpeg.run() compared to a
+    bare Popen of the same command."""
+    from subprocess import Popen, PIPE
+    ffmpeg = fake_command(lines=0)
+
+    def wrapped():
+        process = ffmpeg.run()
+        list(process.readlines())
+        process.wait()
+
+    def bare():
+        Popen(list(ffmpeg), stdin=PIPE, stdout=PIPE,
+              stderr=PIPE).communicate()
+
+    results = []
+    for name, spawn in [('popen', bare), ('run', wrapped)]:
+        seconds = min(timeit.repeat(spawn, repeat=3, number=number))
+        results.append((name, seconds / number * 1e3, 'ms'))
+    results.append(('overhead', results[1][1] - results[0][1], 'ms'))
+    return results
+
+
+def bench_frames(frames=200, size=(320, 240)):
+    """Throughput of FrameReader with frames from the fake."""
+    if numpy is None:
+        return []
+    frame_size = size[0] * size[1] * 3
+    input = fake_command(frames=frames, frame_size=frame_size)[0]
+    reader = FrameReader(input, size, binary=FAKE_FFMPEG)
+    start = time.time()
+    count = sum(1 for _ in reader)
+    seconds = time.time() - start
+    return [('frames', count / seconds, 'frames/s'),
+            ('throughput', count * frame_size / seconds / 1e6, 'MB/s')]
+
+
+BENCHMARKS = [
+    ('argv', bench_compile),
+    ('reader', bench_reader),
+    ('latency', bench_latency),
+    ('pool', bench_pool),
+    ('spawn', bench_spawn),
+    ('frames', bench_frames),
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('names', nargs='*', metavar='benchmark',
+                        help=', '.join(name for name, _ in BENCHMARKS))
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    report = {'python': platform.python_version(),
+              'platform': platform.platform(),
+              'time': time.time(), 'results': {}}
+    for name, bench in BENCHMARKS:
+        if args.names and name not in args.names:
+            continue
+        results = bench()
+        report['results'][name] = dict(
+            (metric, {'value': value, 'unit': unit})
+            for metric, value, unit in results)
+        if not args.json:
+            print(name)
+            for metric, value, unit in results:
+                print('  %-12s %12.3f %s' % (metric, value, unit))
+    if args.json:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+A deterministic stand-in for the ffmpeg binary.
+
+It accepts the arguments ffmpegwrapper builds, writes output which looks
+like the one of an encode and exits. Real options are ignored except
+``-progress pipe:N``, ``-nostats`` and the output ``pipe:1``. The
+behaviour is controlled with these options:
+
+-fake_lines N       number of status lines on stderr (default 100)
+-fake_rate N        status lines per second, 0 for no delay (default 0)
+-fake_frames N      binary frames written to stdout if the output is
+                    pipe:1 (default 0)
+-fake_frame_size N  bytes per frame (default 6220800, 1080p rgb24)
+-fake_timestamps    append the time.time() of each status line
+-fake_stall N       hang for N seconds after the first status line
+-fake_quit N        0 to ignore ``q`` on stdin (default 1)
+-fake_term N        0 to ignore SIGTERM (default 1)
+-fake_write N       write N bytes to the output file
+-fake_showinfo N    log a line of the showinfo filter every N status
+                    lines (default 0)
+-fake_exit N        exit code (default 0)
+
+If an input is ``pipe:0`` the fake reads stdin until it is closed and
+logs the number of bytes. Otherwise ``q`` on stdin ends the status
+lines early like it does for ffmpeg, but not before the first one and
+not during a stall.
+"""
+
+import os
+import signal
+import sys
+import threading
+import time
+
+HEADER = """ffmpeg version fake Copyright (c) 2000-2014 the FFmpeg developers
+  built on Jan  1 2014 00:00:00 with gcc 4.8
+Input #0, matroska,webm, from '%(input)s':
+  Duration: 02:00:00.00, start: 0.000000, bitrate: 5000 kb/s
+    Stream #0:0: Video: h264 (High), yuv420p, 1920x1080, 25 fps
+    Stream #0:1: Audio: aac, 48000 Hz, stereo, fltp
+Output #0, mp4, to '%(output)s':
+    Stream #0:0: Video: h264 (libx264), yuv420p, 1920x1080, q=-1--1, 25 fps
+Stream mapping:
+  Stream #0:0 -> #0:0 (h264 -> libx264)
+Press [q] to stop, [?] for help
+"""
+
+STATUS = ('frame=%(frame)5d fps= 25 q=28.0 size=%(size)8dkB '
+          'time=%(time)s bitrate=5000.0kbits/s speed=1.00x')
+
+SHOWINFO = ('[Parsed_showinfo_1 @ 0x5555d5c0] n:%(n)4d pts:%(pts)7d '
+            'pts_time:%(pts_time)-7s duration:   1024 fmt:yuv420p '
+            'sar:1/1 s:1920x1080 i:P iskey:1 type:I')
+
+PROGRESS = """frame=%(frame)d
+fps=25.00
+bitrate=5000.0kbits/s
+total_size=%(total_size)d
+out_time_us=%(out_time_us)d
+out_time_ms=%(out_time_us)d
+out_time=%(time)s
+speed=1.00x
+progress=%(progress)s
+"""
+
+
+def parse(argv):
+    options = {'lines': 100, 'rate': 0.0, 'frames': 0,
+               'frame_size': 1920 * 1080 * 3, 'timestamps': False,
+               'stall': 0, 'quit': 1, 'term': 1, 'write': 0, 'showinfo': 0,
+               'exit': 0, 'progress': None, 'stats': True,
+               'inputs': [], 'output': None}
+    args = iter(argv)
+    for arg in args:
+        if arg == '-fake_timestamps':
+            options['timestamps'] = True
+        elif arg == '-fake_rate':
+            options['rate'] = float(next(args))
+        elif arg.startswith('-fake_'):
+            options[arg[len('-fake_'):]] = int(next(args))
+        elif arg == '-progress':
+            options['progress'] = next(args)
+        elif arg == '-nostats':
+            options['stats'] = False
+        elif arg == '-i':
+            options['inputs'].append(next(args))
+        elif arg == '--':
+            options['output'] = next(args, None)
+        elif not arg.startswith('-'):
+            options['output'] = arg
+    return options
+
+
+def timestamp(frame):
+    seconds = frame / 25.0
+    return '%02d:%02d:%05.2f' % (seconds // 3600, seconds % 3600 // 60,
+                                 seconds % 60)
+
+
+def watch_quit(fileno, quit):
+    for key in iter(lambda: os.read(fileno, 1), b''):
+        if key == b'q':
+            quit.set()
+            return
+
+
+def main(argv):
+    options = parse(argv)
+    if not options['term']:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    stderr = sys.stderr
+    stderr.write(HEADER % {'input': ','.join(options['inputs']),
+                           'output': options['output']})
+
+    if 'pipe:0' in options['inputs']:
+        stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+        size = 0
+        for chunk in iter(lambda: stdin.read(65536), b''):
+            size += len(chunk)
+        stderr.write('read %d bytes from pipe:0\n' % size)
+
+    quit = threading.Event()
+    if options['quit'] and 'pipe:0' not in options['inputs']:
+        thread = threading.Thread(target=watch_quit,
+                                  args=(sys.stdin.fileno(), quit))
+        thread.daemon = True
+        thread.start()
+
+    progress = None
+    if options['progress'] and options['progress'].startswith('pipe:'):
+        progress = os.fdopen(int(options['progress'][len('pipe:'):]), 'w')
+
+    delay = 1.0 / options['rate'] if options['rate'] else 0
+    for frame in range(1, options['lines'] + 1):
+        values = {'frame': frame, 'size': frame * 32,
+                  'total_size': frame * 32768, 'time': timestamp(frame),
+                  'out_time_us': frame * 40000, 'progress': 'continue'}
+        if options['stats']:
+            line = STATUS % values
+            if options['timestamps']:
+                line += ' t=%.6f' % time.time()
+            stderr.write(line + '\r')
+            stderr.flush()
+        if options['showinfo'] and frame % options['showinfo'] == 0:
+            stderr.write(SHOWINFO % {
+                'n': frame // options['showinfo'] - 1, 'pts': frame * 512,
+                'pts_time': '%g' % (frame / 25.0)} + '\n')
+        if progress is not None:
+            if frame == options['lines']:
+                values['progress'] = 'end'
+            progress.write(PROGRESS % values)
+            progress.flush()
+        if frame == 1 and options['stall']:
+            time.sleep(options['stall'])
+        if delay:
+            time.sleep(delay)
+        # Checked after the line, so an early q does not skip the stall.
+        if quit.is_set():
+            break
+
+    if options['output'] == 'pipe:1' and options['frames']:
+        stdout = getattr(sys.stdout, 'buffer', sys.stdout)
+        frame = b'\x80' * options['frame_size']
+        for _ in range(options['frames']):
+            stdout.write(frame)
+        stdout.flush()
+
+    if options['write']:
+        with open(options['output'], 'wb') as output:
+            output.write(b'\x00' * options['write'])
+
+    stderr.write('\nvideo:1024kB audio:128kB subtitle:0kB '
+                 'global headers:0kB muxing overhead: 0.5%\n')
+    stderr.flush()
+    if progress is not None:
+        progress.close()
+    return options['exit']
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -16,4 +16,4 @@ __version__ = '0.1-dev'
 
 from .ffmpeg import FFmpeg, Input, Output
 from .codec import VideoCodec, AudioCodec, NO_AUDIO, NO_VIDEO
-from .filter import VideoFilter, AudioFilter
+from .filter import VideoFilter, AudioFilter, FilterGraph
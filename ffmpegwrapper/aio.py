@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.aio
+    ~~~~~~~~~~~~~~~~~
+
+    Runs FFmpeg inside an asyncio event loop. One loop can supervise
+    many processes without starting a thread for each of them.
+
+    This module requires Python 3.6 or newer.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import asyncio
+from asyncio.subprocess import PIPE, STDOUT
+
+from .ffmpeg import as_bytes_view
+from .reader import CHUNK_SIZE, LineSplitter
+
+
+class AsyncFFmpegProcess(object):
+    """Class to execute FFmpeg with asyncio.
+
+    It can be used as an asynchronous iterator over the output lines
+    and as an asynchronous context manager::
+
+        async with AsyncFFmpegProcess(ffmpeg) as process:
+            async for line in process:
+                print(line)
+
+    If a task waiting for the process gets cancelled, the process will
+    be terminated.
+
+    Data for the stdin of FFmpeg, e.g. from an ``Input`` with an
+    asynchronous iterator of bytes, is written by a task. Blocking
+    file-like objects are read in the default executor.
+
+    :param command: a sequence of the binary and it arguments
+    :param stdin: an asynchronous iterator of bytes, a file-like or a
+                  bytes-like object. Default is the data of an
+                  :class:`~ffmpegwrapper.Input` of `command`
+    """
+
+    def __init__(self, command, stdin=None):
+        if stdin is None:
+            stdin = getattr(command, 'source', None)
+        compile = getattr(command, 'compile', None)
+        self.command = list(compile() if compile else command)
+        self._stdin = stdin
+        self._pump = None
+        #: The exception which stopped writing the data to stdin.
+        self.stdin_error = None
+        self.process = None
+
+    async def run(self):
+        """Executes the command. The outputs (stderr and stdout) are
+        read by :meth:`readlines`.
+
+        :return: self
+        """
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command, stdin=PIPE, stdout=PIPE, stderr=STDOUT)
+        if self._stdin is not None:
+            self._pump = asyncio.ensure_future(self._pump_stdin(self._stdin))
+        return self
+
+    async def _pump_stdin(self, source):
+        stdin = self.process.stdin
+        try:
+            if hasattr(source, '__aiter__'):
+                async for chunk in source:
+                    stdin.write(chunk)
+                    await stdin.drain()
+            elif hasattr(source, 'read'):
+                loop = asyncio.get_event_loop()
+                while True:
+                    chunk = await loop.run_in_executor(
+                        None, source.read, CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    stdin.write(chunk)
+                    await stdin.drain()
+            else:
+                stdin.write(as_bytes_view(source))
+                await stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as error:
+            self.stdin_error = error
+        finally:
+            stdin.close()
+
+    @property
+    def running(self):
+        return self.process.returncode is None
+
+    @property
+    def successful(self):
+        return self.process.returncode == 0
+
+    @property
+    def failed(self):
+        return not (self.successful or self.running)
+
+    def _terminate(self):
+        if self._pump is not None:
+            self._pump.cancel()
+        if self.process is not None and self.process.returncode is None:
+            try:
+                self.process.terminate()
+            except ProcessLookupError:
+                pass
+
+    async def readlines(self, keepends=False):
+        """Yield the lines of the output of the command. You can
+        specify if you want to keep newlines at the ends. Default is to
+        drop them.
+
+        :param keepends: keep the newlines at the end. Default=False
+        """
+        splitter = LineSplitter()
+        stdout = self.process.stdout
+        try:
+            while True:
+                chunk = await stdout.read(CHUNK_SIZE)
+                lines = splitter.feed(chunk) if chunk else splitter.flush()
+                for line in lines:
+                    yield line if keepends else line.rstrip('\r\n')
+                if not chunk:
+                    break
+        except asyncio.CancelledError:
+            self._terminate()
+            raise
+
+    async def wait(self):
+        """Wait until the command has finished.
+
+        :return: the returncode of the command
+        """
+        try:
+            return await self.process.wait()
+        except asyncio.CancelledError:
+            self._terminate()
+            raise
+
+    async def write(self, data):
+        """Write `data` to the stdin of the command and wait until the
+        pipe accepts more data. `data` can be any object with the buffer
+        protocol, e.g. bytes or a NumPy array.
+
+        :param data: a bytes-like object
+        """
+        self.process.stdin.write(as_bytes_view(data))
+        await self.process.stdin.drain()
+
+    def close_stdin(self):
+        """Close the stdin of the command to signal the end of input."""
+        self.process.stdin.close()
+
+    def __getattr__(self, name):
+        if self.process:
+            return getattr(self.process, name)
+        raise AttributeError
+
+    def __aiter__(self):
+        return self.readlines()
+
+    async def __aenter__(self):
+        if self.process is None:
+            await self.run()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self._terminate()
+        await self.process.wait()
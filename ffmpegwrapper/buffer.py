@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.buffer
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Bounded queues for the output of FFmpeg with a choice of what
+    happens if the consumer does not keep up.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+from collections import deque
+from time import time
+
+try:
+    from Queue import Queue, Full
+except ImportError:
+    from queue import Queue, Full
+
+
+#: Block the reader until the consumer takes lines. Nothing gets lost,
+#: but FFmpeg stalls on its full pipe if nobody reads.
+BLOCK = 'block'
+#: Drop the oldest lines to make room, a ring buffer of the newest lines.
+DROP_OLDEST = 'drop_oldest'
+#: Drop every line. Only the counters are updated.
+DISCARD = 'discard'
+
+POLICIES = (BLOCK, DROP_OLDEST, DISCARD)
+
+#: Marks the end of the output in a closed :class:`OutputQueue`.
+EOF = object()
+
+
+class OutputQueue(Queue):
+    """A :class:`Queue` for lines which is bounded by the number of
+    lines and the size of the lines. The size of a line is its length,
+    which is its size in bytes for the ASCII output of FFmpeg.
+
+    What happens with a line which does not fit anymore is decided by
+    the `policy`. Lines which got dropped are counted in
+    :attr:`dropped_lines` and :attr:`dropped_bytes`. A single line
+    which is larger than `maxbytes` is accepted by an empty queue.
+
+    After the last line the producer calls :meth:`close`, consumers then
+    get :data:`EOF` instead of waiting for more lines.
+
+    :param maxsize: maximum number of lines, 0 for no limit
+    :param maxbytes: maximum size of all lines, None for no limit
+    :param policy: one of :data:`BLOCK`, :data:`DROP_OLDEST` or
+                   :data:`DISCARD`
+    :param sizeof: function which returns the size of an item.
+                   Default is :func:`len`
+    """
+
+    def __init__(self, maxsize=2000, maxbytes=None, policy=BLOCK,
+                 sizeof=len):
+        if policy not in POLICIES:
+            raise ValueError('Unknown policy %r, expected one of %s' %
+                             (policy, ', '.join(POLICIES)))
+        self.maxbytes = maxbytes
+        self.policy = policy
+        self.sizeof = sizeof
+        #: Size of the lines in the queue.
+        self.bytes = 0
+        #: Number of lines which were dropped.
+        self.dropped_lines = 0
+        #: Size of the lines which were dropped.
+        self.dropped_bytes = 0
+        Queue.__init__(self, maxsize)
+
+    def _init(self, maxsize):
+        self.queue = deque()
+
+    def _put(self, item):
+        self.queue.append(item)
+        self.bytes += self.sizeof(item)
+
+    def _get(self):
+        item = self.queue.popleft()
+        if item is not EOF:
+            self.bytes -= self.sizeof(item)
+        return item
+
+    def _full(self, size):
+        if not self.queue:
+            return False
+        if 0 < self.maxsize <= len(self.queue):
+            return True
+        return self.maxbytes is not None and self.bytes + size > self.maxbytes
+
+    def _drop(self, size):
+        self.dropped_lines += 1
+        self.dropped_bytes += size
+
+    def put(self, item, block=True, timeout=None):
+        """Put `item` into the queue according to the policy. With
+        :data:`BLOCK` it behaves like :meth:`Queue.put`, the other
+        policies never block.
+        """
+        size = self.sizeof(item)
+        with self.not_full:
+            if self.policy == DISCARD:
+                self._drop(size)
+                return
+            if self.policy == DROP_OLDEST:
+                while self._full(size):
+                    self._drop(self.sizeof(self._get()))
+            elif not block:
+                if self._full(size):
+                    raise Full
+            elif timeout is None:
+                while self._full(size):
+                    self.not_full.wait()
+            else:
+                end = time() + timeout
+                while self._full(size):
+                    remaining = end - time()
+                    if remaining <= 0:
+                        raise Full
+                    self.not_full.wait(remaining)
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def close(self):
+        """Append :data:`EOF` regardless of the policy and the limits.
+        Nothing should be put after it."""
+        with self.not_full:
+            self.queue.append(EOF)
+            self.unfinished_tasks += 1
+            self.not_empty.notify_all()
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.cache
+    ~~~~~~~~~~~~~~~~~~~
+
+    A content addressed cache for the outputs of FFmpeg commands, so
+    identical jobs are only encoded once.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+from collections import namedtuple
+from threading import Lock
+
+from .ffmpeg import Input, Output, as_bytes_view
+from .probe import file_key
+
+
+class CacheResult(namedtuple('CacheResult', ['key', 'hit', 'returncode',
+                                             'output'])):
+    """The result of :meth:`TranscodeCache.run`: the key of the job or
+    None if it could not be cached, if the outputs came from the cache,
+    the returncode and the output lines of FFmpeg. A hit has no output
+    lines."""
+
+    __slots__ = ()
+
+
+#: Bytes read at the start, the middle and the end of a file for a
+#: partial fingerprint.
+SAMPLE_SIZE = 1024 * 1024
+
+#: Arguments which do not change the outputs and are left out of the key.
+IGNORED_FLAGS = frozenset(['-y', '-n', '-hide_banner', '-nostats',
+                           '-stats', '-nostdin'])
+IGNORED_OPTIONS = frozenset(['-loglevel', '-v', '-progress',
+                             '-stats_period'])
+
+_full_hashes = {}
+_full_hashes_lock = Lock()
+
+
+def fingerprint(file_path, full=False):
+    """Return a hex digest of the content of `file_path`.
+
+    The partial fingerprint hashes the size, the modification time and
+    three samples of :data:`SAMPLE_SIZE` bytes, which is cheap for large
+    files. A change between the samples is only noticed through the
+    modification time. The full fingerprint hashes all of the content
+    and is remembered for the size and modification time of the file.
+
+    :param full: hash the whole file. Default=False
+    """
+    digest = hashlib.sha256()
+    if full:
+        key = file_key(file_path)
+        with _full_hashes_lock:
+            if key in _full_hashes:
+                return _full_hashes[key]
+        with open(file_path, 'rb') as input:
+            for chunk in iter(lambda: input.read(SAMPLE_SIZE), b''):
+                digest.update(chunk)
+        with _full_hashes_lock:
+            _full_hashes[key] = digest.hexdigest()
+        return digest.hexdigest()
+
+    _, size, mtime = file_key(file_path)
+    digest.update(('%d:%d' % (size, mtime)).encode('ascii'))
+    with open(file_path, 'rb') as input:
+        for offset in sorted(set([0, max(0, size // 2 - SAMPLE_SIZE // 2),
+                                  max(0, size - SAMPLE_SIZE)])):
+            input.seek(offset)
+            digest.update(input.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def _cacheable_output(file_path):
+    return not (file_path.startswith('pipe:') or '%' in file_path or
+                '|' in file_path or file_path == os.devnull)
+
+
+def _normalize(args):
+    result = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in IGNORED_OPTIONS:
+            skip = True
+        elif arg not in IGNORED_FLAGS:
+            result.append(arg)
+    return result
+
+
+def job_key(ffmpeg, full=False):
+    """Return the cache key of the :class:`~ffmpegwrapper.FFmpeg` object
+    `ffmpeg` and the paths of its outputs. The key is a hash of the
+    arguments, in which the inputs are replaced by their
+    :func:`fingerprint` and the outputs by their position and file
+    extension.
+
+    :return: (key, output paths) or (None, None) if the command can not
+             be cached, e.g. because an input is not a local file or an
+             output is a pipe or a pattern
+    """
+    args = [ffmpeg.binary]
+    outputs = []
+    for container in ffmpeg.iteritems():
+        if isinstance(container, Input):
+            source = container.source
+            if source is None:
+                if not os.path.isfile(container.file_path):
+                    return None, None
+                content = fingerprint(container.file_path, full)
+            elif hasattr(source, 'read') or hasattr(source, '__aiter__'):
+                return None, None
+            else:
+                content = hashlib.sha256(as_bytes_view(source)).hexdigest()
+            args.extend(list(container.compile())[:-1])
+            args.append('sha256:' + content)
+        elif isinstance(container, Output):
+            if not _cacheable_output(container.file_path):
+                return None, None
+            # Without -f the extension decides the container format.
+            extension = os.path.splitext(container.file_path)[1].lower()
+            args.extend(list(container.compile())[:-1])
+            args.append('output:%d%s' % (len(outputs), extension))
+            outputs.append(container.file_path)
+        else:
+            args.extend(arg for arg in container if arg)
+    if not outputs:
+        return None, None
+    digest = hashlib.sha256()
+    for arg in _normalize(args):
+        digest.update(arg.encode('utf8') + b'\0')
+    return digest.hexdigest(), outputs
+
+
+def _place(source, destination, link):
+    """Link or copy `source` to `destination`, replacing it."""
+    if os.path.lexists(destination):
+        os.remove(destination)
+    if link:
+        try:
+            os.link(source, destination)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(source, destination)
+
+
+class TranscodeCache(object):
+    """Stores the outputs of FFmpeg commands in `directory` under the
+    :func:`job_key` of the command. Running the same command on the same
+    input content again only restores the outputs::
+
+        cache = TranscodeCache('/var/cache/ffmpeg', max_bytes=50 * 2 ** 30)
+        result = cache.run(FFmpeg('ffmpeg', Input('/old.mkv'), output))
+
+    Outputs are copied into the cache and made read-only there. They
+    are restored as hardlinks if possible and as copies otherwise.
+    Restored hardlinks share their content with the cache, so they are
+    read-only as well and must be replaced instead of modified in
+    place. Before FFmpeg writes to an output with several links, the
+    output is removed. The least recently used entries are removed once
+    the cache holds more than `max_bytes`.
+
+    :param directory: the cache directory, it is created if necessary
+    :param max_bytes: maximal size of the cache. Default is no limit
+    :param full: use full instead of partial fingerprints of the inputs
+    :param link: restore the outputs as hardlinks. Default=True
+    """
+
+    def __init__(self, directory, max_bytes=None, full=False, link=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.full = full
+        self.link = link
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key, file_paths):
+        """Restore the outputs of `key` to `file_paths`.
+
+        :return: True if the key was in the cache
+        """
+        entry = self.entry_path(key)
+        if not os.path.isdir(entry):
+            return False
+        try:
+            for index, file_path in enumerate(file_paths):
+                _place(os.path.join(entry, str(index)), file_path,
+                       self.link)
+            os.utime(entry, None)
+        except (IOError, OSError):
+            # The entry was evicted in the meantime.
+            return False
+        return True
+
+    def put(self, key, file_paths):
+        """Store the outputs `file_paths` under `key`."""
+        entry = self.entry_path(key)
+        parent = os.path.dirname(entry)
+        if not os.path.isdir(parent):
+            os.makedirs(parent)
+        temporary = tempfile.mkdtemp(prefix='.', dir=parent)
+        try:
+            for index, file_path in enumerate(file_paths):
+                cached = os.path.join(temporary, str(index))
+                # A link would share the mode and make the output of the
+                # caller read-only.
+                _place(file_path, cached, False)
+                mode = os.stat(cached).st_mode
+                os.chmod(cached, mode & ~(stat.S_IWUSR | stat.S_IWGRP |
+                                          stat.S_IWOTH))
+            os.rename(temporary, entry)
+        except OSError:
+            # Another process stored the same entry in the meantime.
+            shutil.rmtree(temporary, ignore_errors=True)
+            if not os.path.isdir(entry):
+                raise
+        self.evict()
+
+    def entries(self):
+        """Return a list of (last use, size, path) of all entries."""
+        entries = []
+        for prefix in os.listdir(self.directory):
+            parent = os.path.join(self.directory, prefix)
+            if not os.path.isdir(parent):
+                continue
+            for key in os.listdir(parent):
+                if key.startswith('.'):
+                    continue
+                entry = os.path.join(parent, key)
+                try:
+                    size = sum(os.path.getsize(os.path.join(entry, name))
+                               for name in os.listdir(entry))
+                    entries.append((os.path.getmtime(entry), size, entry))
+                except OSError:
+                    continue
+        return entries
+
+    def evict(self):
+        """Remove the least recently used entries until the cache holds
+        at most `max_bytes`."""
+        if self.max_bytes is None:
+            return
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def _unlink_shared(self, file_paths):
+        """Remove outputs with several links, which are probably
+        restored from the cache, so FFmpeg does not write into the
+        cached content."""
+        for file_path in file_paths:
+            try:
+                if os.stat(file_path).st_nlink > 1:
+                    os.remove(file_path)
+            except OSError:
+                pass
+
+    def run(self, ffmpeg, **options):
+        """Restore the outputs of `ffmpeg` from the cache or execute it
+        and store its outputs if it succeeds.
+
+        :param options: passed to :meth:`~ffmpegwrapper.FFmpeg.run`
+        :return: :class:`CacheResult`
+        """
+        key, file_paths = job_key(ffmpeg, self.full)
+        if key is not None and self.get(key, file_paths):
+            return CacheResult(key, True, 0, [])
+        if key is not None and self.link:
+            self._unlink_shared(file_paths)
+        process = ffmpeg.run(**options)
+        output = list(process.readlines())
+        returncode = process.wait()
+        if key is not None and returncode == 0:
+            self.put(key, file_paths)
+        return CacheResult(key, False, returncode, output)
@@ -11,7 +11,7 @@
 """
 
 from itertools import chain
-from .parameters import ParameterContainer
+from .parameters import ParameterContainer, argument
 
 
 NO_AUDIO = ('-an',)
@@ -21,6 +21,8 @@ NO_VIDEO = ('-vn',)
 class Codec(ParameterContainer):
     """ Container for Codecs-Settings"""
 
+    name = argument('name')
+
     def __init__(self, name, *args):
         self.name = name
         ParameterContainer.__init__(self, *args)
@@ -10,31 +10,203 @@
 """
 
 
+import errno
+import os
+from bisect import bisect_right
+from collections import deque
 from subprocess import Popen, PIPE, STDOUT
 from itertools import chain
-from threading import Thread
+from threading import Event, Thread
+from time import time
+
+from . import metrics
+from .buffer import BLOCK, DROP_OLDEST, EOF, OutputQueue
+from .parameters import ParameterContainer, Parameter, argument
+from .progress import ProgressParser
+from .reader import CHUNK_SIZE, iter_chunks, iter_lines
+from .stats import encoded_seconds, process_stats, wait_with_usage
+
+
+def as_bytes_view(data):
+    """Return a flat byte :class:`memoryview` of `data`. Only data which
+    is not contiguous in memory gets copied."""
+    view = memoryview(data)
+    if not view.c_contiguous:
+        view = memoryview(view.tobytes())
+    return view.cast('B')
+
 
 try:
-    from Queue import Queue, Empty
-except ImportError:
-    from queue import Queue, Empty
+    string_types = basestring
+except NameError:
+    string_types = str
+
+
+def _no_size(item):
+    return 0
+
+
+def as_source(file_path):
+    """Return `file_path` if it is data for the stdin of FFmpeg instead
+    of a path: a readable file-like object, an asynchronous iterator of
+    bytes or a bytes-like object. Otherwise return None."""
+    if isinstance(file_path, string_types):
+        return None
+    if hasattr(file_path, 'read') or hasattr(file_path, '__aiter__'):
+        return file_path
+    try:
+        memoryview(file_path)
+    except TypeError:
+        return None
+    return file_path
+
+
+def write_source(source, stdin):
+    """Write the data `source` of an :class:`Input` to `stdin` and close
+    it. A broken pipe means that FFmpeg does not read any further, which
+    is not an error.
+
+    :return: the exception which stopped the writing or None
+    """
+    try:
+        read = getattr(source, 'read', None)
+        if read is None:
+            stdin.write(as_bytes_view(source))
+        else:
+            while True:
+                chunk = read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                stdin.write(chunk)
+    except Exception as error:
+        if getattr(error, 'errno', None) != errno.EPIPE:
+            return error
+    finally:
+        try:
+            stdin.close()
+        except EnvironmentError:
+            pass
+    return None
+
+
+def parse_time(value):
+    """Return a time of FFmpeg like ``90``, ``1:30`` or ``00:01:30.5``
+    in seconds.
+
+    :raises ValueError: if `value` is negative or not a time
+    """
+    if isinstance(value, string_types):
+        seconds = 0.0
+        try:
+            for part in value.strip().split(':'):
+                seconds = seconds * 60 + float(part)
+        except ValueError:
+            raise ValueError('Invalid time %r' % value)
+    else:
+        seconds = float(value)
+    if seconds < 0:
+        raise ValueError('Negative time %r' % value)
+    return seconds
+
 
-from .parameters import ParameterContainer, Parameter
+def _format_time(seconds):
+    text = ('%.6f' % seconds).rstrip('0')
+    return text + '0' if text.endswith('.') else text
 
 
 class Input(ParameterContainer):
     """Container for an input file.
 
-    :param file_path: Path to the input file
+    Instead of a path the input can be a readable file-like object, a
+    bytes-like object or an asynchronous iterator of bytes. FFmpeg then
+    reads ``pipe:0`` and the data is written to its stdin when the
+    command runs::
+
+        response = urlopen('http://example.com/clip.mp4')
+        FFmpeg('ffmpeg', Input(response), Output('/new.mkv')).run()
+
+    Asynchronous iterators are only supported by
+    :meth:`FFmpeg.run_async`.
+
+    :meth:`seek` and :meth:`duration` cut the input. Their ``-ss`` and
+    ``-t`` always come first, before the other parameters and ``-i``.
+
+    :param file_path: Path to the input file or the data
     :param args: A list of Containers that should be appended
     """
 
+    file_path = argument('file_path')
+    #: The position of the input seek in seconds or None.
+    seek_position = argument('seek_position')
+    #: The duration which is read in seconds or None.
+    seek_duration = argument('seek_duration')
+    #: The part of a hybrid seek which is done on the output side.
+    seek_offset = argument('seek_offset')
+
     def __init__(self, file_path, *args):
+        #: The data which is written to stdin or None.
+        self.source = as_source(file_path)
+        if self.source is not None:
+            file_path = 'pipe:0'
         self.file_path = file_path
+        self.seek_position = None
+        self.seek_duration = None
+        self.seek_offset = 0.0
         ParameterContainer.__init__(self, *args)
 
+    def _check(self, name):
+        for item in self.container_list:
+            if isinstance(item, Parameter) and item.name == name:
+                raise ValueError('The input already has a %s parameter' %
+                                 name)
+
+    def seek(self, position, output=None, margin=10, keyframes=None):
+        """Start reading at `position`. FFmpeg seeks in the input to the
+        keyframe before `position` and only decodes the frames from
+        there, instead of decoding and dropping everything before it
+        like a seek on the output side does.
+
+        With an `output` the seek is hybrid: the input is seeked to
+        `margin` seconds before `position` and the `output` drops the
+        rest, which is exact for any input and codec. If the
+        `keyframes` of the input are known, the input is seeked to the
+        keyframe before `position` instead, so only the frames from
+        there are decoded and dropped.
+
+        :param position: seconds or a time like ``00:01:30.5``
+        :param output: the :class:`Output` for the fine seek
+        :param margin: seconds of the fine seek
+        :param keyframes: the sorted keyframe timestamps, e.g. a
+                          :class:`~ffmpegwrapper.keyframes.KeyframeIndex`
+        """
+        self._check('-ss')
+        position = parse_time(position)
+        offset = 0.0
+        if output is not None:
+            offset = min(position, float(margin))
+            index = bisect_right(keyframes, position) if keyframes else 0
+            if index:
+                offset = position - keyframes[index - 1]
+            output.seek(offset)
+        self.seek_offset = offset
+        self.seek_position = position - offset
+        return self
+
+    def duration(self, duration):
+        """Read only `duration` seconds from the seek position. The
+        part of a hybrid seek on the output side is added."""
+        self._check('-t')
+        self.seek_duration = parse_time(duration)
+        return self
+
     def __iter__(self):
-        return chain(ParameterContainer.__iter__(self),
+        cut = []
+        if self.seek_position is not None:
+            cut.extend(['-ss', _format_time(self.seek_position)])
+        if self.seek_duration is not None:
+            cut.extend(['-t', _format_time(self.seek_duration +
+                                           self.seek_offset)])
+        return chain(cut, ParameterContainer.__iter__(self),
                      ['-i', self.file_path])
 
 
@@ -45,8 +217,13 @@ class Output(ParameterContainer):
     :param args: A list of Containers that should be appended
     """
 
+    file_path = argument('file_path')
+    #: The position of the output seek in seconds or None.
+    seek_position = argument('seek_position')
+
     def __init__(self, file_path, *args):
         self.file_path = file_path
+        self.seek_position = None
         ParameterContainer.__init__(self, *args)
 
     def overwrite(self):
@@ -54,51 +231,329 @@ class Output(ParameterContainer):
         self.add_parameter('-y', None)
         return self
 
+    def seek(self, position):
+        """Drop the decoded frames before `position`. This is exact but
+        slow for long seeks, prefer :meth:`Input.seek`."""
+        self.seek_position = parse_time(position)
+        return self
+
     def __iter__(self):
-        return chain(ParameterContainer.__iter__(self), ['--', self.file_path])
+        cut = []
+        if self.seek_position is not None:
+            cut = ['-ss', _format_time(self.seek_position)]
+        return chain(cut, ParameterContainer.__iter__(self),
+                     ['--', self.file_path])
 
 
 class FFmpegProcess(object):
     """Class to exectute FFmpeg.
 
+    With `progress` enabled FFmpeg writes its progress through an
+    additional pipe (``-progress pipe:N -nostats``). The parsed
+    :class:`~ffmpegwrapper.progress.ProgressEvent` objects are
+    available through :meth:`readprogress` and :attr:`last_progress`,
+    apart from the log lines. This needs a POSIX system with Python 3.
+
+    The lines wait in :attr:`queue`, an
+    :class:`~ffmpegwrapper.buffer.OutputQueue` bounded by `maxlines`
+    and `maxbytes`. The `policy` decides what happens if it is full:
+    :data:`~ffmpegwrapper.buffer.BLOCK` stops reading until the lines
+    are consumed, which lets FFmpeg wait as well. For jobs whose output
+    is not read use :data:`~ffmpegwrapper.buffer.DROP_OLDEST` or
+    :data:`~ffmpegwrapper.buffer.DISCARD`. Independent of the policy the
+    last `tail` lines are kept in :attr:`tail` for error reports.
+
+    By default the stdout of FFmpeg is read together with the log on
+    stderr. For an ``Output('pipe:1')`` pass `stdout` to keep the binary
+    data apart: with :data:`subprocess.PIPE` it is read with
+    :meth:`readchunks`, with a file-like object or a socket it is
+    written to it by a thread::
+
+        output = Output('pipe:1', Parameter('-f', 'mpegts'))
+        with open('/new.ts', 'wb') as sink:
+            FFmpeg('ffmpeg', Input('/old.mkv'), output).run(
+                stdout=sink).wait()
+
+    Once the command has finished, :attr:`stats` holds the
+    :class:`~ffmpegwrapper.stats.ProcessStats` with the resources it
+    used.
+
+    A `timeout` limits the wall time of the command and a
+    `stall_timeout` the time without progress, i.e. while the encoded
+    duration does not advance. If one of them expires, a watchdog thread
+    calls :meth:`stop` with the `escalation` timeouts. The stall timer
+    starts with the first reported position, so a command which reports
+    none, e.g. with ``-nostats`` and without `progress`, is only limited
+    by `timeout`.
+
+    `observers` are notified about the lifecycle of the process in
+    addition to the ones registered with
+    :func:`~ffmpegwrapper.metrics.add_observer`. Without observers
+    there are no extra calls.
+
     :param command: a sequence of the binary and it arguments
+    :param progress: report progress events. Default=False
+    :param policy: the overflow policy of the queue. Default=BLOCK
+    :param maxlines: maximum number of lines in the queue
+    :param maxbytes: maximum size of the lines in the queue
+    :param tail: number of lines to keep in :attr:`tail`
+    :param stdout: None to read stdout with the log,
+                   :data:`subprocess.PIPE` or an object with a ``write``
+                   or ``sendall`` method
+    :param stdin: a file-like or bytes-like object which is written to
+                  stdin by a thread. Default is the data of an
+                  :class:`Input` of `command`
+    :param observers: additional observers for this process
+    :param timeout: maximum seconds the command may run
+    :param stall_timeout: maximum seconds without progress
+    :param escalation: the `quit_timeout` and `terminate_timeout` of
+                       :meth:`stop` for the watchdog
     """
 
-    def __init__(self, command):
-        self.command = list(command)
-        self.queue = Queue(maxsize=2000)
+    def __init__(self, command, progress=False, policy=BLOCK,
+                 maxlines=2000, maxbytes=None, tail=100, stdout=None,
+                 stdin=None, observers=(), timeout=None, stall_timeout=None,
+                 escalation=(5, 5)):
+        if stdin is None:
+            stdin = getattr(command, 'source', None)
+        if hasattr(stdin, '__aiter__'):
+            raise ValueError('Asynchronous iterators are only supported '
+                             'by AsyncFFmpegProcess')
+        compile = getattr(command, 'compile', None)
+        self.command = list(compile() if compile else command)
+        self._stdin = stdin
+        #: The exception which stopped writing the data to stdin.
+        self.stdin_error = None
+        self._stdout = stdout
+        self._drain_thread = None
+        #: The exception which stopped writing stdout to the sink.
+        self.stdout_error = None
+        self.queue = OutputQueue(maxlines, maxbytes, policy)
+        self.progress_queue = None
+        if progress:
+            self.progress_queue = OutputQueue(2000, policy=DROP_OLDEST,
+                                              sizeof=_no_size)
+        self.last_progress = None
+        #: The last lines of the output.
+        self.tail = deque(maxlen=tail)
+        #: An :class:`threading.Event` which is set once the command has
+        #: exited and all of its output is in the queue.
+        self.finished = Event()
+        #: The :class:`~ffmpegwrapper.stats.ProcessStats` of the finished
+        #: command.
+        self.stats = None
+        self._started = None
+        #: Seconds the job waited in a pool before it was started.
+        self.queue_wait = None
+        self.observers = metrics.observers + list(observers)
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self.escalation = escalation
+        #: Why the process was stopped, e.g. ``timeout`` or ``stall``.
+        self.stop_reason = None
+        #: The steps :meth:`stop` took: ``quit``, ``terminate``, ``kill``.
+        self.stop_steps = []
         self.process = None
 
+    def _notify(self, hook, *args):
+        if self.observers:
+            metrics.notify(metrics.hooks(self.observers, hook), self, *args)
+
     def _queue_output(self, out, queue):
-        """Read the output from the command bytewise. On every newline
-        the line is put to the queue."""
-        line = bytearray()
-        running = self.running
-
-        while running:
-            byte = out.read(1)
-            if byte == b'':
-                running = self.running
-                continue
-            line += byte
-            if byte in (b'\n', b'\r'):
-                queue.put(''.join(line.decode('utf8')), timeout=0.4)
-                line = bytearray()
+        """Read the output from the command in chunks. Every completed
+        line is put to the queue. At the end of the output the thread
+        waits for the exit of the command and closes the queue."""
+        tail = self.tail
+        on_line = metrics.hooks(self.observers, 'on_line')
+        if on_line:
+            for line in iter_lines(out):
+                tail.append(line)
+                queue.put(line)
+                metrics.notify(on_line, self, line)
+        else:
+            for line in iter_lines(out):
+                tail.append(line)
+                queue.put(line)
         out.close()
+        self._collect_stats()
+        if self._drain_thread is not None:
+            self._drain_thread.join()
+        self._notify('on_exit', self.process.returncode)
+        queue.close()
+        self.finished.set()
+
+    def _collect_stats(self):
+        """Wait for the exit of the command and create :attr:`stats`."""
+        usage, io = wait_with_usage(self.process)
+        wall_time = None
+        if self._started is not None:
+            wall_time = time() - self._started
+        progress = self.last_progress
+        if progress is not None and progress.out_time_us is not None:
+            encoded = progress.out_time_us / 1e6
+        else:
+            encoded = encoded_seconds(self.tail)
+        self.stats = process_stats(wall_time, usage, io, encoded)
+
+    def _drain_stdout(self, out, sink):
+        """Write the stdout of the command to `sink` in chunks. If the
+        sink fails, stdout is closed, which makes FFmpeg fail as well."""
+        write = getattr(sink, 'sendall', None) or sink.write
+        try:
+            for chunk in iter_chunks(out):
+                write(chunk)
+        except Exception as error:
+            self.stdout_error = error
+            self._notify('on_error', error)
+        finally:
+            out.close()
+
+    def _queue_progress(self, out, queue):
+        """Read the progress output from the command and put an event
+        to the queue for every block. If the queue is full, the oldest
+        event is dropped."""
+        parser = ProgressParser()
+        for line in iter_lines(out):
+            event = parser.feed(line)
+            if event is not None:
+                self.last_progress = event
+                queue.put(event)
+                self._notify('on_progress', event)
+        out.close()
+        queue.close()
+
+    def _pump_stdin(self, source, stdin):
+        """Write `source` to the stdin of the command and close it."""
+        error = write_source(source, stdin)
+        if error is not None:
+            self.stdin_error = error
+            self._notify('on_error', error)
+
+    def _position(self):
+        """Return a value which changes while the command progresses."""
+        progress = self.last_progress
+        if progress is not None:
+            return progress.frame, progress.out_time_us
+        return encoded_seconds(list(self.tail))
+
+    def _watch(self, timeout, stall_timeout):
+        """Stop the command if it runs longer than `timeout` or does
+        not progress for `stall_timeout` seconds."""
+        limits = [limit for limit in (timeout, stall_timeout) if limit]
+        interval = min(1.0, max(0.05, min(limits) / 10.0))
+        position = None
+        moved = self._started
+        while not self.finished.wait(interval):
+            now = time()
+            current = self._position()
+            if current is not None and current != position:
+                position, moved = current, now
+            if timeout and now - self._started > timeout:
+                reason = 'timeout'
+            elif stall_timeout and position is not None and \
+                    now - moved > stall_timeout:
+                reason = 'stall'
+            else:
+                continue
+            self.stop(*self.escalation, reason=reason)
+            return
+
+    def _quit(self):
+        """Send ``q`` to FFmpeg. Not possible if stdin carries data."""
+        if self._stdin is not None:
+            return False
+        try:
+            self.process.stdin.write(b'q')
+            self.process.stdin.flush()
+        except (EnvironmentError, ValueError):
+            return False
+        return True
+
+    def stop(self, quit_timeout=5, terminate_timeout=5, reason=None):
+        """Stop the command in steps. First ``q`` is sent to FFmpeg, so
+        it finishes the outputs and they stay valid. If it has not
+        exited after `quit_timeout` seconds, it gets SIGTERM and after
+        `terminate_timeout` more seconds SIGKILL. Each step is recorded
+        in :attr:`stop_steps` and reported to the ``on_stop(process,
+        step, reason)`` method of the observers.
+
+        The end of the command is noticed once its output has been
+        read, so with the BLOCK policy the lines have to be consumed.
+
+        :param reason: stored in :attr:`stop_reason`
+        :return: the returncode or None if the command has not exited
+        """
+        self.stop_reason = reason
+        steps = [('quit', self._quit, quit_timeout),
+                 ('terminate', self.process.terminate, terminate_timeout),
+                 ('kill', self.process.kill, terminate_timeout)]
+        for step, action, timeout in steps:
+            if self.finished.is_set():
+                break
+            try:
+                if action() is False:
+                    continue
+            except EnvironmentError:
+                # The process exited in the meantime.
+                continue
+            self.stop_steps.append(step)
+            self._notify('on_stop', step, reason)
+            if self.finished.wait(timeout):
+                break
+        return self.process.returncode
+
+    def _start_thread(self, target, out, queue, daemon):
+        thread = Thread(target=target, args=(out, queue))
+        thread.daemon = daemon
+        thread.start()
+        return thread
 
     def run(self, daemon=True):
         """Executes the command. A thread will be started to collect
         the outputs (stderr and stdout) from that command.
-        The outputs will be written to the queue.
+        The outputs will be written to the queue. If stdout is written
+        to a sink, another thread does this.
 
         :return: self
         """
-        self.process = Popen(self.command, bufsize=1,
-                             stdin=PIPE, stdout=PIPE, stderr=STDOUT)
-        thread = Thread(target=self._queue_output,
-                        args=(self.process.stdout, self.queue))
-        thread.deamon = daemon
-        thread.start()
+        command = self.command
+        options = {}
+        if self.progress_queue is not None:
+            progress_fd, write_fd = os.pipe()
+            command = command[:1] + [
+                '-progress', 'pipe:%d' % write_fd, '-nostats'] + command[1:]
+            options['pass_fds'] = (write_fd,)
+        stderr = STDOUT if self._stdout is None else PIPE
+        self._started = time()
+        try:
+            self.process = Popen(command, stdin=PIPE, stdout=PIPE,
+                                 stderr=stderr, **options)
+        except Exception as error:
+            self._notify('on_error', error)
+            raise
+        finally:
+            if options:
+                os.close(write_fd)
+        self._notify('on_spawn')
+        if self._stdout is None:
+            log = self.process.stdout
+        else:
+            log = self.process.stderr
+            if self._stdout != PIPE:
+                self._drain_thread = self._start_thread(
+                    self._drain_stdout, self.process.stdout, self._stdout,
+                    daemon)
+        self._start_thread(self._queue_output, log, self.queue, daemon)
+        if self._stdin is not None:
+            self._start_thread(self._pump_stdin, self._stdin,
+                               self.process.stdin, daemon)
+        if options:
+            self._start_thread(self._queue_progress,
+                               os.fdopen(progress_fd, 'rb'),
+                               self.progress_queue, daemon)
+        if self.timeout or self.stall_timeout:
+            self._start_thread(self._watch, self.timeout,
+                               self.stall_timeout, True)
         return self
 
     @property
@@ -113,6 +568,27 @@ class FFmpegProcess(object):
     def failed(self):
         return not (self.successful or self.running)
 
+    def wait(self, timeout=None):
+        """Wait until the command has exited and its output has been
+        read. Other than :meth:`subprocess.Popen.wait` it returns None
+        if the `timeout` in seconds expires.
+
+        :return: the returncode of the command
+        """
+        self.finished.wait(timeout)
+        if self.finished.is_set():
+            return self.process.returncode
+
+    def _iter_queue(self, queue):
+        get = queue.get
+        while True:
+            item = get()
+            if item is EOF:
+                # Leave the end for other and later readers.
+                queue.close()
+                return
+            yield item
+
     def readlines(self, keepends=False):
         """Yield lines from the queue that were collected from the
         command. You can specify if you want to keep newlines at the ends.
@@ -120,16 +596,46 @@ class FFmpegProcess(object):
 
         :param keepends: keep the newlines at the end. Default=False
         """
-        running = self.process.poll() is None
-        while running or self.queue.qsize():
-            try:
-                line = self.queue.get(timeout=0.05)
-                if keepends:
-                    yield line
-                else:
-                    yield line.rstrip('\r\n')
-            except Empty:
-                running = self.process.poll() is None
+        for line in self._iter_queue(self.queue):
+            if keepends:
+                yield line
+            else:
+                yield line.rstrip('\r\n')
+
+    def readprogress(self):
+        """Yield the :class:`~ffmpegwrapper.progress.ProgressEvent`
+        objects of the command. Only available if the process was
+        created with `progress` enabled.
+        """
+        if self.progress_queue is None:
+            raise ValueError('Progress is not enabled for this process')
+        return self._iter_queue(self.progress_queue)
+
+    def readchunks(self, chunk_size=CHUNK_SIZE):
+        """Yield the binary stdout of the command in chunks. Only
+        available if the process was created with ``stdout=PIPE``. The
+        chunks are views of one reusable buffer and only valid until
+        the next one is requested.
+
+        :param chunk_size: maximal number of bytes of a chunk
+        """
+        if self._stdout != PIPE:
+            raise ValueError('stdout is not a pipe of this process')
+        return iter_chunks(self.process.stdout, chunk_size)
+
+    def write(self, data):
+        """Write `data` to the stdin of the command. `data` can be any
+        object with the buffer protocol, e.g. bytes or a NumPy array,
+        and is written without copying it if it is contiguous. Blocks
+        while the pipe is full.
+
+        :param data: a bytes-like object
+        """
+        self.process.stdin.write(as_bytes_view(data))
+
+    def close_stdin(self):
+        """Close the stdin of the command to signal the end of input."""
+        self.process.stdin.close()
 
     def __getattr__(self, name):
         if self.process:
@@ -152,22 +658,50 @@ class FFmpeg(ParameterContainer):
     :param args: A list of Containers that should be appended
     """
 
+    binary = argument('binary')
+
     def __init__(self, binary='ffmpeg', *args):
         self.binary = binary
         self.process = None
         ParameterContainer.__init__(self, *args)
 
     def add_parameter(self, key, value):
-        self.container_list.insert(0, Parameter(key, value))
+        self.insert(0, Parameter(key, value))
 
-    def run(self):
+    @property
+    def source(self):
+        """The data of the :class:`Input` which reads from stdin or
+        None."""
+        sources = [container.source for container in self.container_list
+                   if getattr(container, 'source', None) is not None]
+        if len(sources) > 1:
+            raise ValueError('Only one input can read from stdin')
+        return sources[0] if sources else None
+
+    def run(self, progress=False, **options):
         """Executes the command of this object. Returns a
         :class:`FFmpegProcess` object which have already the
         :meth:`FFmpegProcess.run` invoked.
 
+        :param progress: report progress events. Default=False
+        :param options: the queue options of :class:`FFmpegProcess`
         :return: :class:`FFmpegProcess` object with `run()` invoked
         """
-        return FFmpegProcess(self).run()
+        return FFmpegProcess(self, progress, **options).run()
+
+    def run_async(self):
+        """Executes the command of this object within the asyncio event
+        loop. The result has to be awaited and is a
+        :class:`~ffmpegwrapper.aio.AsyncFFmpegProcess` object which
+        have already the :meth:`AsyncFFmpegProcess.run` invoked.
+
+        Requires Python 3.6 or newer.
+
+        :return: awaitable which resolves to a
+                 :class:`~ffmpegwrapper.aio.AsyncFFmpegProcess`
+        """
+        from .aio import AsyncFFmpegProcess
+        return AsyncFFmpegProcess(self).run()
 
     def __enter__(self):
         self.process = self.run()
@@ -182,4 +716,4 @@ class FFmpeg(ParameterContainer):
         return chain([self.binary], ParameterContainer.__iter__(self))
 
     def __str__(self):
-        return" ".join(self)
+        return " ".join(self.compile())
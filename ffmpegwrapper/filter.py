@@ -10,7 +10,7 @@
 """
 
 from itertools import chain
-from .parameters import ParameterContainer
+from .parameters import ParameterContainer, Parameter
 
 
 class FilterContainer(ParameterContainer):
@@ -82,6 +82,10 @@ class VideoFilter(FilterContainer):
         self.add_formatparam('format', *args)
         return self
 
+    def fps(self, fps):
+        self.add_formatparam('fps', fps)
+        return self
+
     def freior(self, name, *args):
         self.add_formatparam('frei0r', name, *args)
         return self
@@ -144,10 +148,22 @@ class VideoFilter(FilterContainer):
         self.add_formatparam('setsar', x, y)
         return self
 
+    def showinfo(self):
+        self.add_parameter('showinfo', None)
+        return self
+
     def slicify(self, height=16):
         self.add_formatparam('slicify', height)
         return self
 
+    def split(self, outputs=2):
+        self.add_formatparam('split', outputs)
+        return self
+
+    def tile(self, columns, rows):
+        self.add_formatparam('tile', '%dx%d' % (columns, rows))
+        return self
+
     def transpose(self, type):
         if str(type) not in ['0', '1', '2', '3']:
             raise ValueError('Invalid Parameter for transpose. '
@@ -186,6 +202,14 @@ class AudioFilter(FilterContainer):
         http://ffmpeg.org/ffmpeg.html#Audio-Filters
     """
 
+    def amix(self, inputs=2, duration=None):
+        self.add_formatparam('amix', inputs, duration)
+        return self
+
+    def asplit(self, outputs=2):
+        self.add_formatparam('asplit', outputs)
+        return self
+
     def null(self):
         """does nothing"""
         self.add_parameter('null', None)
@@ -193,3 +217,145 @@ class AudioFilter(FilterContainer):
 
     def __iter__(self):
         return chain(['-af', FilterContainer.__str__(self)])
+
+
+class Pad(object):
+    """A labelled link of a :class:`FilterGraph`. Pads are created by
+    the graph; use them as inputs of other filters or map them to an
+    output with :meth:`FilterGraph.map`.
+    """
+
+    def __init__(self, graph, label, stream=False):
+        self.graph = graph
+        self.label = label
+        self.stream = stream
+
+    def __str__(self):
+        return '[%s]' % self.label
+
+    def __repr__(self):
+        return '<Pad %s>' % self
+
+
+class FilterGraph(ParameterContainer):
+    """Builds a ``-filter_complex`` graph with labelled pads. It allows
+    to decode an input once and to feed several outputs with it::
+
+        graph = FilterGraph()
+        big, small = graph.split(graph.stream('0:v'))
+        small = graph.filter(small, VideoFilter().scale(640, -1))
+        FFmpeg('ffmpeg', Input('/old'), graph,
+               Output('/big.mp4', graph.map(big)),
+               Output('/small.mp4', graph.map(small)))
+
+    The nodes are built from :class:`VideoFilter` and
+    :class:`AudioFilter` objects. Every pad has to be used exactly once,
+    by another filter or by :meth:`map`; the graph raises a
+    :class:`ValueError` when its arguments are built otherwise.
+    """
+
+    def __init__(self):
+        ParameterContainer.__init__(self)
+        self._labels = 0
+        self._produced = set()
+        self._consumed = {}
+
+    def stream(self, specifier):
+        """Return a pad for an input stream like ``0:v`` or ``1:a:0``.
+        Input streams may be used more than once."""
+        return Pad(self, specifier, stream=True)
+
+    def _pad(self, label=None):
+        if label is None:
+            while 'p%d' % self._labels in self._produced:
+                self._labels += 1
+            label = 'p%d' % self._labels
+        self._produced.add(label)
+        return Pad(self, label)
+
+    def _consume(self, pad, user):
+        if not isinstance(pad, Pad) or pad.graph is not self:
+            raise ValueError('%r is not a pad of this graph' % (pad,))
+        if pad.stream:
+            return
+        if pad.label in self._consumed:
+            raise ValueError('Pad %s is already used by %s' %
+                             (pad, self._consumed[pad.label]))
+        self._consumed[pad.label] = user
+
+    def filter(self, inputs, filters, outputs=1, labels=None):
+        """Add a node which applies `filters` to `inputs`.
+
+        :param inputs: a :class:`Pad` or a list of them
+        :param filters: a :class:`VideoFilter` or :class:`AudioFilter`
+                        or any other :class:`FilterContainer`
+        :param outputs: number of output pads of the node
+        :param labels: names for the output pads. Default are
+                       generated ones
+        :return: the output :class:`Pad` or a list of them if
+                 `outputs` is not 1
+        """
+        if isinstance(inputs, Pad):
+            inputs = [inputs]
+        description = FilterContainer.__str__(filters)
+        if not description:
+            raise ValueError('A node needs at least one filter')
+        labels = list(labels or [None] * outputs)
+        if len(labels) != outputs:
+            raise ValueError('Expected %d labels' % outputs)
+        for label in labels:
+            if label in self._produced:
+                raise ValueError('Label %s is already used' % label)
+        for pad in inputs:
+            self._consume(pad, description)
+        pads = [self._pad(label) for label in labels]
+        self.append((list(inputs), description, pads))
+        return pads[0] if outputs == 1 else pads
+
+    def split(self, pad, outputs=2):
+        """Split a video pad into `outputs` pads."""
+        return self.filter(pad, VideoFilter().split(outputs), outputs)
+
+    def asplit(self, pad, outputs=2):
+        """Split an audio pad into `outputs` pads."""
+        return self.filter(pad, AudioFilter().asplit(outputs), outputs)
+
+    def overlay(self, main, overlay, x=0, y=0):
+        """Place the video of `overlay` at `x`, `y` on `main`."""
+        return self.filter([main, overlay], VideoFilter().overlay(x, y))
+
+    def amix(self, *pads, **kwargs):
+        """Mix the audio of all `pads`.
+
+        :param duration: longest, shortest or first
+        """
+        return self.filter(list(pads), AudioFilter().amix(
+            len(pads), kwargs.get('duration')))
+
+    def map(self, pad):
+        """Return the ``-map`` parameter which sends `pad` to the output
+        it is appended to."""
+        self._consume(pad, 'map')
+        self._invalidate()
+        if pad.stream:
+            return Parameter('-map', pad.label)
+        return Parameter('-map', str(pad))
+
+    def validate(self):
+        """Raise a :class:`ValueError` if an output pad is not used."""
+        for inputs, description, pads in self.container_list:
+            for pad in pads:
+                if pad.label not in self._consumed:
+                    raise ValueError('Pad %s of %s is not connected' %
+                                     (pad, description))
+
+    def __str__(self):
+        return ';'.join(
+            ''.join(map(str, inputs)) + description + ''.join(map(str, pads))
+            for inputs, description, pads in self.container_list)
+
+    def __iter__(self):
+        if not self.container_list:
+            return iter([])
+        self.validate()
+        return iter(['-filter_complex', str(self)])
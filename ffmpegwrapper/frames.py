@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.frames
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Decodes video frames straight into NumPy arrays and encodes frames
+    which are written from Python.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+from collections import deque
+from subprocess import Popen, PIPE
+from threading import Thread
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .buffer import DROP_OLDEST
+from .codec import NO_AUDIO
+from .ffmpeg import FFmpeg, FFmpegProcess, Input, Output, \
+    as_bytes_view, write_source
+from .reader import iter_lines
+
+
+#: Channels and sample type of the supported raw pixel formats.
+PIXEL_FORMATS = {
+    'gray': (1, 'u1'),
+    'gray16le': (1, '<u2'),
+    'rgb24': (3, 'u1'),
+    'bgr24': (3, 'u1'),
+    'rgb48le': (3, '<u2'),
+    'rgba': (4, 'u1'),
+    'bgra': (4, 'u1'),
+}
+
+
+def readinto_full(out, view):
+    """Fill `view` from `out`. Returns the number of bytes read, which
+    is only smaller than the view at the end of the stream."""
+    size = len(view)
+    position = 0
+    while position < size:
+        read = out.readinto(view[position:])
+        if not read:
+            break
+        position += read
+    return position
+
+
+class FrameReader(object):
+    """Iterates over the decoded frames of `input` as NumPy arrays of
+    the shape (height, width, channels). With a `batch_size` arrays of
+    the shape (batch_size, height, width, channels) are yielded, the
+    last batch may be smaller.
+
+    The frames are read with ``readinto`` into `buffers` preallocated
+    buffers which are used in turn. An array is therefore only valid
+    until `buffers` more arrays have been yielded; copy it if you need
+    it longer.
+
+    If `input` reads data from Python, it is written to the stdin of
+    FFmpeg by a thread. An error while writing ends up in
+    :attr:`stdin_error`.
+
+    :param input: the :class:`~ffmpegwrapper.Input` to decode
+    :param size: (width, height) of the frames. FFmpeg scales to it
+    :param pix_fmt: one of :data:`PIXEL_FORMATS`. Default is rgb24
+    :param containers: additional containers for the output, e.g. a
+                       :class:`~ffmpegwrapper.VideoFilter`
+    :param binary: the ffmpeg binary
+    :param batch_size: number of frames per array. Default is a single
+                       frame without the batch axis
+    :param buffers: number of buffers which are used in turn
+    """
+
+    def __init__(self, input, size, pix_fmt='rgb24', containers=(),
+                 binary='ffmpeg', batch_size=None, buffers=2):
+        if numpy is None:
+            raise ImportError('FrameReader requires numpy')
+        if pix_fmt not in PIXEL_FORMATS:
+            raise ValueError('Unsupported pixel format %r' % pix_fmt)
+        if hasattr(input.source, '__aiter__'):
+            raise ValueError('Asynchronous iterators are only supported '
+                             'by AsyncFFmpegProcess')
+        self.input = input
+        self.size = size
+        self.pix_fmt = pix_fmt
+        self.containers = list(containers)
+        self.binary = binary
+        self.batch_size = batch_size
+        self.buffers = max(1, buffers)
+        self.errors = deque(maxlen=100)
+        self.returncode = None
+        self.stdin_error = None
+
+    @property
+    def frame_shape(self):
+        width, height = self.size
+        return (height, width, PIXEL_FORMATS[self.pix_fmt][0])
+
+    @property
+    def command(self):
+        """The :class:`~ffmpegwrapper.FFmpeg` object which is executed."""
+        output = Output('pipe:1', *self.containers)
+        output.add_parameter('-f', 'rawvideo')
+        output.add_parameter('-pix_fmt', self.pix_fmt)
+        output.add_parameter('-s', '{0}x{1}'.format(*self.size))
+        output.append(NO_AUDIO)
+        return FFmpeg(self.binary, self.input, output)
+
+    def _collect_errors(self, out):
+        for line in iter_lines(out):
+            self.errors.append(line.rstrip('\r\n'))
+        out.close()
+
+    def _pump_stdin(self, stdin):
+        self.stdin_error = write_source(self.input.source, stdin)
+
+    def _allocate(self):
+        dtype = numpy.dtype(PIXEL_FORMATS[self.pix_fmt][1])
+        shape = self.frame_shape
+        if self.batch_size:
+            shape = (self.batch_size,) + shape
+        arrays = []
+        for _ in range(self.buffers):
+            buffer = bytearray(int(numpy.prod(shape)) * dtype.itemsize)
+            arrays.append((memoryview(buffer),
+                           numpy.frombuffer(buffer, dtype).reshape(shape)))
+        return arrays
+
+    def frames(self):
+        """Start FFmpeg and yield the arrays."""
+        process = Popen(list(self.command), stdin=PIPE, stdout=PIPE,
+                        stderr=PIPE)
+        thread = Thread(target=self._collect_errors, args=(process.stderr,))
+        thread.daemon = True
+        thread.start()
+        if self.input.source is not None:
+            pump = Thread(target=self._pump_stdin, args=(process.stdin,))
+            pump.daemon = True
+            pump.start()
+        arrays = self._allocate()
+        frames = self.batch_size or 1
+        try:
+            number = 0
+            while True:
+                view, array = arrays[number % len(arrays)]
+                number += 1
+                read = readinto_full(process.stdout, view)
+                complete = read * frames // len(view)
+                if complete == frames:
+                    yield array
+                    continue
+                if complete and self.batch_size:
+                    yield array[:complete]
+                break
+        finally:
+            if process.poll() is None:
+                process.terminate()
+            process.stdout.close()
+            self.returncode = process.wait()
+            thread.join()
+
+    def __iter__(self):
+        return self.frames()
+
+
+def raw_video_input(size, pix_fmt='rgb24', rate=25):
+    """Return an :class:`~ffmpegwrapper.Input` which reads raw video
+    frames from stdin.
+
+    :param size: (width, height) of the frames
+    :param pix_fmt: the pixel format of the frames. Default is rgb24
+    :param rate: frames per second. Default is 25
+    """
+    input = Input('pipe:0')
+    input.add_parameter('-f', 'rawvideo')
+    input.add_parameter('-pix_fmt', pix_fmt)
+    input.add_parameter('-s', '{0}x{1}'.format(*size))
+    input.add_parameter('-r', str(rate))
+    return input
+
+
+def raw_audio_input(sample_fmt='s16le', rate=48000, channels=2):
+    """Return an :class:`~ffmpegwrapper.Input` which reads raw PCM
+    samples from stdin.
+
+    :param sample_fmt: a PCM format like s16le or f32le. Default is s16le
+    :param rate: samples per second. Default is 48000
+    :param channels: number of interleaved channels. Default is 2
+    """
+    input = Input('pipe:0')
+    input.add_parameter('-f', sample_fmt)
+    input.add_parameter('-ar', str(rate))
+    input.add_parameter('-ac', str(channels))
+    return input
+
+
+class FrameWriter(object):
+    """Encodes frames which are written from Python to `output`. Every
+    object with the buffer protocol is accepted, e.g. NumPy arrays of
+    the shape (height, width, channels) or a batch of them. The data is
+    written to the stdin of FFmpeg without copying it, and
+    :meth:`write` blocks while FFmpeg falls behind::
+
+        with FrameWriter(Output('out.mp4', VideoCodec('libx264')),
+                         (640, 480)) as writer:
+            for frame in render():
+                writer.write(frame)
+
+    The log of FFmpeg is not read while frames are written, only the
+    newest lines are kept. The last ones are in ``writer.process.tail``.
+
+    For asyncio run :attr:`command` with
+    :meth:`~ffmpegwrapper.FFmpeg.run_async` and await
+    :meth:`~ffmpegwrapper.aio.AsyncFFmpegProcess.write` instead.
+
+    :param output: the :class:`~ffmpegwrapper.Output` to encode to
+    :param size: (width, height) of the frames
+    :param pix_fmt: one of :data:`PIXEL_FORMATS`. Default is rgb24
+    :param rate: frames per second. Default is 25
+    :param binary: the ffmpeg binary
+    """
+
+    def __init__(self, output, size, pix_fmt='rgb24', rate=25,
+                 binary='ffmpeg'):
+        if pix_fmt not in PIXEL_FORMATS:
+            raise ValueError('Unsupported pixel format %r' % pix_fmt)
+        self.output = output
+        self.size = size
+        self.pix_fmt = pix_fmt
+        self.rate = rate
+        self.binary = binary
+        self.process = None
+
+    @property
+    def frame_size(self):
+        """Number of bytes of one frame."""
+        width, height = self.size
+        channels, dtype = PIXEL_FORMATS[self.pix_fmt]
+        return width * height * channels * int(dtype[-1])
+
+    @property
+    def command(self):
+        """The :class:`~ffmpegwrapper.FFmpeg` object which is executed."""
+        input = raw_video_input(self.size, self.pix_fmt, self.rate)
+        return FFmpeg(self.binary, input, self.output)
+
+    def open(self):
+        """Start FFmpeg.
+
+        :return: self
+        """
+        self.process = FFmpegProcess(self.command,
+                                     policy=DROP_OLDEST).run()
+        return self
+
+    def write(self, frames):
+        """Write one frame or a batch of frames.
+
+        :param frames: a bytes-like object with a multiple of
+                       :attr:`frame_size` bytes
+        """
+        view = as_bytes_view(frames)
+        if len(view) % self.frame_size:
+            raise ValueError('Expected a multiple of %d bytes, got %d' %
+                             (self.frame_size, len(view)))
+        self.process.write(view)
+
+    def close(self):
+        """Signal the end of the frames and wait for FFmpeg.
+
+        :return: the returncode of FFmpeg
+        """
+        self.process.close_stdin()
+        return self.process.wait()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self.process.poll() is None:
+            self.process.terminate()
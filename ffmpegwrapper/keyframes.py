@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.keyframes
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    An index of the keyframes of a video, built with one scan of its
+    packets and cached in memory and on disk, keyed by the path, size
+    and modification time of the file.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from subprocess import CalledProcessError, Popen, PIPE
+from threading import Lock
+
+from .probe import file_key
+
+
+_MAGIC = b'ffmpegwrapper-keyframes 1\n'
+
+
+def _number(value):
+    return value not in ('', 'N/A')
+
+
+class KeyframeIndex(object):
+    """The sorted timestamps of the keyframes of a video in seconds and
+    the byte offsets of their packets, -1 where the offset is unknown.
+    Both are kept in :class:`array.array` objects of doubles, which
+    take 16 bytes per keyframe.
+
+    The index is a sequence of the timestamps, so it can be passed as
+    `keyframes` to :func:`~ffmpegwrapper.segment.plan_segments` and
+    :meth:`~ffmpegwrapper.Input.seek`. All queries are bisections.
+    """
+
+    def __init__(self, times=(), offsets=None):
+        self.times = array('d', times)
+        if offsets is None:
+            offsets = [-1.0] * len(self.times)
+        self.offsets = array('d', offsets)
+        if len(self.offsets) != len(self.times):
+            raise ValueError('Expected %d offsets, got %d' %
+                             (len(self.times), len(self.offsets)))
+
+    def _before(self, time):
+        index = bisect_right(self.times, time) - 1
+        return index if index >= 0 else None
+
+    def before(self, time):
+        """Return the last keyframe at or before `time` or None."""
+        index = self._before(time)
+        return None if index is None else self.times[index]
+
+    def after(self, time):
+        """Return the first keyframe at or after `time` or None."""
+        index = bisect_left(self.times, time)
+        return self.times[index] if index < len(self.times) else None
+
+    def nearest(self, time):
+        """Return the keyframe nearest to `time` or None if the index
+        is empty."""
+        index = bisect_left(self.times, time)
+        candidates = self.times[max(0, index - 1):index + 1]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda keyframe: abs(keyframe - time))
+
+    def offset(self, time):
+        """Return the byte offset of the last keyframe at or before
+        `time` or None."""
+        index = self._before(time)
+        if index is None or self.offsets[index] < 0:
+            return None
+        return int(self.offsets[index])
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, index):
+        return self.times[index]
+
+    def __iter__(self):
+        return iter(self.times)
+
+    def __repr__(self):
+        return "<{cls} {count} keyframes>".format(
+            cls=self.__class__.__name__, count=len(self))
+
+
+def scan_keyframes(file_path, ffprobe='ffprobe'):
+    """Read the packet table of the first video stream of `file_path`
+    with ffprobe. Nothing is decoded and the output is parsed while it
+    is read.
+
+    :return: :class:`KeyframeIndex`
+    :raises subprocess.CalledProcessError: if ffprobe fails
+    """
+    command = [ffprobe, '-v', 'error', '-select_streams', 'v:0',
+               '-show_entries', 'packet=pts_time,dts_time,pos,flags',
+               '-of', 'csv=p=0', file_path]
+    process = Popen(command, stdout=PIPE)
+    times = array('d')
+    offsets = array('d')
+    for line in process.stdout:
+        fields = line.decode('ascii', 'replace').strip().split(',')
+        if len(fields) < 4 or 'K' not in fields[3]:
+            continue
+        time = fields[0] if _number(fields[0]) else fields[1]
+        if not _number(time):
+            continue
+        times.append(float(time))
+        offsets.append(float(fields[2]) if _number(fields[2]) else -1.0)
+    process.stdout.close()
+    returncode = process.wait()
+    if returncode != 0:
+        raise CalledProcessError(returncode, command)
+    if any(times[i] > times[i + 1] for i in range(len(times) - 1)):
+        pairs = sorted(zip(times, offsets))
+        return KeyframeIndex([time for time, _ in pairs],
+                             [offset for _, offset in pairs])
+    return KeyframeIndex(times, offsets)
+
+
+class KeyframeIndexCache(object):
+    """LRU cache for :class:`KeyframeIndex` objects. If `directory` is
+    given, every index is also stored in a file there and survives the
+    process. The file of a path is replaced when the size or the
+    modification time of the path change.
+
+    :param maxsize: maximal number of indexes kept in memory
+    :param directory: directory of the index files. Default is memory
+                      only
+    """
+
+    def __init__(self, maxsize=64, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def index_path(self, key):
+        digest = hashlib.sha1(key[0].encode('utf8')).hexdigest()
+        return os.path.join(self.directory, digest + '.keyframes')
+
+    def _read(self, key):
+        try:
+            with open(self.index_path(key), 'rb') as stored:
+                if stored.readline() != _MAGIC:
+                    return None
+                header = json.loads(stored.readline().decode('utf8'))
+                if tuple(header['key']) != tuple(key):
+                    return None
+                times, offsets = array('d'), array('d')
+                times.fromfile(stored, header['count'])
+                offsets.fromfile(stored, header['count'])
+        except (EnvironmentError, EOFError, ValueError, KeyError):
+            return None
+        if header['byteorder'] != sys.byteorder:
+            times.byteswap()
+            offsets.byteswap()
+        index = KeyframeIndex()
+        index.times, index.offsets = times, offsets
+        return index
+
+    def _write(self, key, index):
+        path = self.index_path(key)
+        temporary = '%s.%d.tmp' % (path, os.getpid())
+        header = {'key': list(key), 'count': len(index),
+                  'byteorder': sys.byteorder}
+        with open(temporary, 'wb') as stored:
+            stored.write(_MAGIC)
+            stored.write(json.dumps(header).encode('utf8') + b'\n')
+            index.times.tofile(stored)
+            index.offsets.tofile(stored)
+        os.rename(temporary, path)
+
+    def get(self, key):
+        """Return the cached :class:`KeyframeIndex` for `key` or None."""
+        with self._lock:
+            index = self._entries.pop(key, None)
+            if index is None and self.directory is not None:
+                index = self._read(key)
+            if index is not None:
+                self._remember(key, index)
+            return index
+
+    def set(self, key, index):
+        """Store the :class:`KeyframeIndex` `index` for `key`."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._remember(key, index)
+            if self.directory is not None:
+                self._write(key, index)
+        return index
+
+    def _remember(self, key, index):
+        self._entries[key] = index
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries from memory and from the directory."""
+        with self._lock:
+            self._entries.clear()
+            if self.directory is not None:
+                for name in os.listdir(self.directory):
+                    if name.endswith('.keyframes'):
+                        os.remove(os.path.join(self.directory, name))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+#: The cache used by :func:`keyframe_index` if no other one is given.
+default_cache = KeyframeIndexCache()
+
+
+def keyframe_index(file_path, ffprobe='ffprobe', cache=default_cache):
+    """Return the :class:`KeyframeIndex` of `file_path`. The file is
+    only scanned if `cache` has no index for its path, size and
+    modification time.
+
+    :param ffprobe: the ffprobe binary
+    :param cache: a :class:`KeyframeIndexCache` or None to always scan
+    """
+    key = file_key(file_path)
+    index = cache.get(key) if cache is not None else None
+    if index is None:
+        index = scan_keyframes(file_path, ffprobe)
+        if cache is not None:
+            cache.set(key, index)
+    return index
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.ladder
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Builds a single FFmpeg command which decodes an input once and
+    encodes several renditions of it, e.g. an adaptive bitrate ladder.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+from collections import OrderedDict
+
+from .codec import NO_AUDIO
+from .ffmpeg import FFmpeg, Output, string_types
+from .filter import FilterGraph, VideoFilter
+from .parameters import Parameter
+
+
+def tee_path(file_paths):
+    """Join `file_paths` to the output path of the tee muxer."""
+    escaped = []
+    for path in file_paths:
+        for special in '\\|[]':
+            path = path.replace(special, '\\' + special)
+        escaped.append(path)
+    return '|'.join(escaped)
+
+
+class Ladder(object):
+    """Encodes several renditions of `input` with one FFmpeg process.
+    The video is decoded once and split with a :class:`FilterGraph`
+    into one scaler per rendition::
+
+        ladder = Ladder(Input('/old.mkv'), AudioCodec('aac').bitrate('128k'))
+        ladder.add_rendition('/1080.mp4', VideoCodec('libx264'),
+                             (1920, 1080), '5000k')
+        ladder.add_rendition('/720.mp4', VideoCodec('libx264'),
+                             (1280, 720), '3000k')
+        ladder.add_thumbnails('/thumb%04d.jpg', 10, (320, 180))
+        process = ladder.run()
+
+    Renditions with the same codec settings, size and bitrate are only
+    encoded once and written to all their files with the tee muxer.
+
+    :param input: the :class:`~ffmpegwrapper.Input` to encode
+    :param audio: the :class:`~ffmpegwrapper.AudioCodec` for the audio
+                  of the renditions. Default is to drop the audio
+    :param binary: the ffmpeg binary
+    """
+
+    def __init__(self, input, audio=None, binary='ffmpeg'):
+        self.input = input
+        self.audio = audio
+        self.binary = binary
+        self.renditions = OrderedDict()
+        self.audio_outputs = []
+        self.thumbnails = []
+
+    def add_rendition(self, file_paths, codec, size, bitrate):
+        """Add a video rendition.
+
+        :param file_paths: a path or a list of paths which get the same
+                           encoded streams
+        :param codec: the :class:`~ffmpegwrapper.VideoCodec`
+        :param size: (width, height) to scale to
+        :param bitrate: the video bitrate, e.g. ``3000k``
+        """
+        if isinstance(file_paths, string_types):
+            file_paths = [file_paths]
+        key = (tuple(codec.compile()), tuple(size), str(bitrate))
+        if key in self.renditions:
+            self.renditions[key][1].extend(file_paths)
+        else:
+            self.renditions[key] = (codec, list(file_paths))
+        return self
+
+    def add_audio_output(self, file_path, codec):
+        """Add an output with only the audio of the input.
+
+        :param codec: the :class:`~ffmpegwrapper.AudioCodec`
+        """
+        self.audio_outputs.append((file_path, codec))
+        return self
+
+    def add_thumbnails(self, file_path, interval, size=None):
+        """Add images of the video every `interval` seconds.
+
+        :param file_path: a pattern like ``thumb%04d.jpg``
+        :param size: (width, height) of the images. Default is the size
+                     of the input
+        """
+        self.thumbnails.append((file_path, interval, size))
+        return self
+
+    def _rendition_output(self, graph, pad, codec, bitrate, file_paths):
+        containers = [graph.map(pad), codec,
+                      Parameter('-b:v', str(bitrate))]
+        if self.audio is None:
+            containers.append(NO_AUDIO)
+        else:
+            containers.extend([Parameter('-map', '0:a?'), self.audio])
+        if len(file_paths) == 1:
+            return Output(file_paths[0], *containers)
+        # The tee muxer can not ask its outputs, so the headers which
+        # e.g. mp4 needs out of band are always written.
+        containers.extend([Parameter('-flags', '+global_header'),
+                           Parameter('-f', 'tee')])
+        return Output(tee_path(file_paths), *containers)
+
+    def command(self):
+        """Return the :class:`~ffmpegwrapper.FFmpeg` object which
+        encodes all outputs."""
+        graph = FilterGraph()
+        outputs = []
+        branches = len(self.renditions) + len(self.thumbnails)
+        if branches:
+            pads = [graph.stream('0:v')]
+            if branches > 1:
+                pads = graph.split(pads[0], branches)
+
+            for pad, (key, rendition) in zip(pads, self.renditions.items()):
+                codec, file_paths = rendition
+                width, height = key[1]
+                pad = graph.filter(pad, VideoFilter().scale(width, height))
+                outputs.append(self._rendition_output(
+                    graph, pad, codec, key[2], file_paths))
+
+            for pad, thumbnail in zip(pads[len(self.renditions):],
+                                      self.thumbnails):
+                file_path, interval, size = thumbnail
+                filters = VideoFilter().fps('1/%s' % interval)
+                if size is not None:
+                    filters.scale(*size)
+                pad = graph.filter(pad, filters)
+                outputs.append(Output(file_path, graph.map(pad)))
+
+        for file_path, codec in self.audio_outputs:
+            outputs.append(Output(file_path, Parameter('-map', '0:a'),
+                                  codec))
+        if not outputs:
+            raise ValueError('The ladder has no outputs')
+        return FFmpeg(self.binary, self.input, graph, *outputs)
+
+    def run(self):
+        """Executes the command.
+
+        :return: :class:`~ffmpegwrapper.ffmpeg.FFmpegProcess` object
+                 with `run()` invoked
+        """
+        return self.command().run()
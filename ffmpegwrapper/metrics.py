@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.metrics
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Observers for the lifecycle of FFmpeg processes and a small metrics
+    registry with an exporter for the text format of Prometheus.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import logging
+import os
+from bisect import bisect_left
+from threading import Lock, Thread
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+log = logging.getLogger(__name__)
+
+#: Observers which are attached to every new process.
+observers = []
+
+INF = float('inf')
+
+
+def add_observer(observer):
+    """Attach `observer` to every process which is created afterwards.
+
+    An observer is any object with some of these methods, the others
+    are not looked for:
+
+    - ``on_spawn(process)`` after the command was started
+    - ``on_line(process, line)`` for every line of the log
+    - ``on_progress(process, event)`` for every progress event
+    - ``on_exit(process, returncode)`` after the command exited and
+      its :attr:`~ffmpegwrapper.ffmpeg.FFmpegProcess.stats` are known
+    - ``on_error(process, error)`` if starting the command, writing its
+      stdin or its stdout failed
+    - ``on_stop(process, step, reason)`` for every step of
+      :meth:`~ffmpegwrapper.ffmpeg.FFmpegProcess.stop`
+
+    The methods are called from the threads of the process. Exceptions
+    are logged and do not affect the process.
+    """
+    observers.append(observer)
+
+
+def remove_observer(observer):
+    """Detach `observer` from processes which are created afterwards."""
+    observers.remove(observer)
+
+
+def hooks(observers, name):
+    """Return the methods called `name` of `observers`."""
+    methods = []
+    for observer in observers:
+        method = getattr(observer, name, None)
+        if method is not None:
+            methods.append(method)
+    return methods
+
+
+def notify(methods, *args):
+    """Call all `methods` with `args` and log their exceptions."""
+    for method in methods:
+        try:
+            method(*args)
+        except Exception:
+            log.exception('Observer %r failed', method)
+
+
+def _format(value):
+    if value == INF:
+        return '+Inf'
+    return repr(value)
+
+
+class Counter(object):
+    """A value which only increases."""
+
+    type = 'counter'
+
+    def __init__(self, name, help=''):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        return [(self.name, '', self.value)]
+
+
+class Gauge(Counter):
+    """A value which goes up and down."""
+
+    type = 'gauge'
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class Histogram(object):
+    """Counts observed values in cumulative buckets.
+
+    :param buckets: the upper bounds of the buckets. A bucket for
+                    infinity is added
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, help='', buckets=(1, 10, 60, 600)):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(set(buckets) | set([INF])))
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        samples = []
+        cumulative = 0
+        for bound, number in zip(self.buckets, counts):
+            cumulative += number
+            samples.append((self.name + '_bucket',
+                            '{le="%s"}' % _format(bound), cumulative))
+        samples.append((self.name + '_sum', '', total))
+        samples.append((self.name + '_count', '', count))
+        return samples
+
+
+class MetricsRegistry(object):
+    """A collection of metrics with unique names. The methods to create
+    a metric return the existing one if the name is already known.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def _get(self, cls, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError('%s is a %s' % (name, metric.type))
+            return metric
+
+    def counter(self, name, help=''):
+        return self._get(Counter, name, help)
+
+    def gauge(self, name, help=''):
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name, help='', buckets=(1, 10, 60, 600)):
+        return self._get(Histogram, name, help, buckets)
+
+    def exposition(self):
+        """Return all metrics in the text format of Prometheus."""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        for name, metric in metrics:
+            if metric.help:
+                lines.append('# HELP %s %s' % (name, metric.help))
+            lines.append('# TYPE %s %s' % (name, metric.type))
+            for sample, labels, value in metric.samples():
+                lines.append('%s%s %s' % (sample, labels, _format(value)))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write the :meth:`exposition` to `path`, e.g. for the textfile
+        collector of the node exporter. The file is replaced at once, so
+        readers never see a partial file."""
+        temporary = '%s.%d.tmp' % (path, os.getpid())
+        with open(temporary, 'w') as output:
+            output.write(self.exposition())
+        os.rename(temporary, path)
+
+    def serve(self, port, host=''):
+        """Serve the :meth:`exposition` over HTTP in a daemon thread.
+
+        :return: the :class:`HTTPServer`, call its ``shutdown`` method
+                 to stop it
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.exposition().encode('utf8')
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer((host, port), Handler)
+        thread = Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return server
+
+
+class MetricsObserver(object):
+    """An observer which records the jobs in a :class:`MetricsRegistry`::
+
+        registry = MetricsRegistry()
+        add_observer(MetricsObserver(registry))
+        registry.serve(9100)
+
+    It has no ``on_line`` method, so it does not slow down reading the
+    log.
+
+    :param registry: the registry. Default is a new one
+    :param prefix: the prefix of the metric names
+    """
+
+    def __init__(self, registry=None, prefix='ffmpeg'):
+        if registry is None:
+            registry = MetricsRegistry()
+        self.registry = registry
+        self.started = registry.counter(
+            prefix + '_jobs_started_total', 'Started processes')
+        self.finished = registry.counter(
+            prefix + '_jobs_finished_total', 'Exited processes')
+        self.failed = registry.counter(
+            prefix + '_jobs_failed_total',
+            'Processes which exited with an error')
+        self.errors = registry.counter(
+            prefix + '_errors_total', 'Errors reported by processes')
+        self.active = registry.gauge(
+            prefix + '_jobs_active', 'Running processes')
+        self.duration = registry.histogram(
+            prefix + '_job_duration_seconds', 'Wall time of processes',
+            (0.1, 1, 10, 30, 60, 300, 600, 1800, 3600, 7200))
+        self.speed = registry.histogram(
+            prefix + '_job_speed', 'Encoded duration per wall time',
+            (0.25, 0.5, 1, 2, 4, 8, 16, 32))
+        self.queue_wait = registry.histogram(
+            prefix + '_job_queue_wait_seconds',
+            'Time jobs waited in a pool before they started',
+            (0.01, 0.1, 1, 10, 60, 300, 600, 1800))
+
+    def on_spawn(self, process):
+        self.started.inc()
+        self.active.inc()
+        if process.queue_wait is not None:
+            self.queue_wait.observe(process.queue_wait)
+
+    def on_exit(self, process, returncode):
+        self.active.dec()
+        self.finished.inc()
+        if returncode:
+            self.failed.inc()
+        stats = process.stats
+        if stats is not None:
+            if stats.wall_time is not None:
+                self.duration.observe(stats.wall_time)
+            if stats.speed is not None:
+                self.speed.observe(stats.speed)
+
+    def on_error(self, process, error):
+        self.errors.inc()
@@ -9,8 +9,10 @@
     :copyright: (c) 2013 by Mathias Koehler.
     :license: BSD, see LICENSE for more details.
 """
+from copy import deepcopy
 from itertools import chain
 from collections import MutableSequence, namedtuple
+from weakref import WeakSet
 
 try:
     from itertools import ifilter
@@ -50,14 +52,108 @@ def format_parameter(*args, **kwargs):
 Parameter = namedtuple('Parameter', ['name', 'value'])
 
 
+class argument(object):
+    """Attribute of a :class:`ParameterContainer` which is part of its
+    arguments. Setting it invalidates the compiled arguments.
+
+    :param name: the name of the attribute
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        try:
+            return instance.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+        if instance._compiled is not None:
+            instance._invalidate()
+
+
 class ParameterContainer(MutableSequence):
+    """Ordered container of :class:`Parameter` objects, other containers
+    and sequences of arguments.
+
+    :meth:`compile` caches the arguments as a tuple. The cache of a
+    container and of all containers which contain it is invalidated if
+    it is modified through the sequence or ``add_*`` methods or if an
+    :class:`argument` attribute like ``file_path`` is set. Plain lists
+    which are appended to a container are not watched.
+
+    The parents are held weakly, so a child which is shared by many
+    commands does not keep them alive.
+    """
+
+    _compiled = None
 
     def __init__(self, *containers):
+        self._parents = WeakSet()
         self.container_list = list(containers)
+        for item in containers:
+            self._adopt(item)
+
+    def _adopt(self, item):
+        """Register this container as parent of `item`."""
+        parents = getattr(item, '_parents', None)
+        if parents is not None:
+            parents.add(self)
+
+    def _release(self, items):
+        """Unregister this container as parent of the removed `items`
+        which it does not contain anymore."""
+        for item in items:
+            parents = getattr(item, '_parents', None)
+            if parents is not None and not any(
+                    other is item for other in self.container_list):
+                parents.discard(self)
+
+    def __getstate__(self):
+        # The links to the parents are weak references, which can not be
+        # pickled. They are rebuilt from the children on the way back.
+        state = self.__dict__.copy()
+        state.pop('_parents', None)
+        state.pop('_compiled', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._parents = WeakSet()
+        for item in self.container_list:
+            self._adopt(item)
+
+    def __deepcopy__(self, memo):
+        copy = self.__class__.__new__(self.__class__)
+        memo[id(self)] = copy
+        copy.__setstate__(deepcopy(self.__getstate__(), memo))
+        return copy
+
+    def _invalidate(self):
+        if self._compiled is not None:
+            self._compiled = None
+            for parent in list(self._parents):
+                parent._invalidate()
+
+    def compile(self):
+        """Return the arguments of this container as an immutable tuple.
+        The tuple is built once and reused until the container or one of
+        its children is modified, so it is cheap to call this again or
+        to compare commands by their compiled arguments.
+        """
+        compiled = self._compiled
+        if compiled is None:
+            compiled = self._compiled = tuple(self)
+        return compiled
 
     def add_parameter(self, key, value):
         """Adds an parameter to the container."""
         self.container_list.append(Parameter(key, value))
+        self._invalidate()
 
     def add_formatparam(self, name, *args, **kwargs):
         """Format the value of an parameter from the *args **kwargs
@@ -67,28 +163,47 @@ class ParameterContainer(MutableSequence):
 
     def insert(self, index, value):
         self.container_list.insert(index, value)
+        self._adopt(value)
+        self._invalidate()
 
     def iteritems(self):
         return iter(self.container_list)
 
     def __iter__(self):
-        return ifilter(None, chain.from_iterable(self.container_list))
+        return ifilter(None, chain.from_iterable(
+            item.compile() if isinstance(item, ParameterContainer) else item
+            for item in self.container_list))
 
     def __len__(self):
         return self.container_list.__len__()
 
     def __setitem__(self, index, value):
+        removed = self.container_list[index]
+        if isinstance(index, slice):
+            value = list(value)
+            for item in value:
+                self._adopt(item)
+        else:
+            removed = [removed]
+            self._adopt(value)
         self.container_list.__setitem__(index, value)
+        self._release(removed)
+        self._invalidate()
 
     def __getitem__(self, index):
         return self.container_list.__getitem__(index)
 
     def __delitem__(self, index):
+        removed = self.container_list[index]
+        if not isinstance(index, slice):
+            removed = [removed]
         self.container_list.__delitem__(index)
+        self._release(removed)
+        self._invalidate()
 
     def __contains__(self, other):
         return self.container_list.__contains__(other)
 
     def __repr__(self):
         return "<{cls} {opts}>".format(
-            opts=list(self), cls=self.__class__.__name__)
+            opts=list(self.compile()), cls=self.__class__.__name__)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.pool
+    ~~~~~~~~~~~~~~~~~~
+
+    Runs many FFmpeg commands with a bounded number of processes.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+from collections import namedtuple
+from concurrent.futures import Future
+from itertools import count
+from multiprocessing import cpu_count
+from threading import Lock, Thread
+from time import time
+
+try:
+    from Queue import PriorityQueue
+except ImportError:
+    from queue import PriorityQueue
+
+from .ffmpeg import FFmpegProcess, Input, Output
+from .stats import StatsTotal
+
+
+class JobResult(namedtuple('JobResult', ['command', 'returncode',
+                                         'output', 'stats'])):
+    """The result of a finished job: the executed command, its
+    returncode, the list of output lines and the
+    :class:`~ffmpegwrapper.stats.ProcessStats` of the process."""
+
+    __slots__ = ()
+
+
+_STOP = float('inf')
+
+
+class JobFuture(Future):
+    """A :class:`concurrent.futures.Future` for a job of a
+    :class:`FFmpegPool`. A pending job can be cancelled with
+    :meth:`cancel`, a running one can be stopped with :meth:`terminate`.
+    """
+
+    def __init__(self):
+        Future.__init__(self)
+        self.process = None
+        self.submitted = time()
+
+    def terminate(self):
+        """Cancel the job if it is pending or terminate its process if
+        it is running.
+
+        :return: True if the job was cancelled or terminated
+        """
+        if self.cancel():
+            return True
+        process = self.process
+        if process is not None and process.running:
+            process.terminate()
+            return True
+        return False
+
+
+class FFmpegPool(object):
+    """Executes :class:`~ffmpegwrapper.FFmpeg` objects with at most
+    `max_workers` processes at the same time. Jobs with a lower
+    priority value are started first, jobs with the same priority in
+    the order they were submitted.
+
+    :param max_workers: number of processes which may run at once.
+                        Default is the number of cores divided by
+                        `threads_per_job`
+    :param threads_per_job: passed as ``-threads`` for every input and
+                            output of a job. Default is to let FFmpeg
+                            decide
+    :param timeout: maximum seconds a job may run
+    :param stall_timeout: maximum seconds a job may run without
+                          progress. See
+                          :class:`~ffmpegwrapper.ffmpeg.FFmpegProcess`
+    """
+
+    def __init__(self, max_workers=None, threads_per_job=None, timeout=None,
+                 stall_timeout=None):
+        if max_workers is None:
+            max_workers = max(1, cpu_count() // (threads_per_job or 1))
+        if max_workers < 1:
+            raise ValueError('max_workers must be greater than 0')
+        self.max_workers = max_workers
+        self.threads_per_job = threads_per_job
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        #: The :class:`~ffmpegwrapper.stats.StatsTotal` of all finished
+        #: jobs.
+        self.stats = StatsTotal()
+        self._queue = PriorityQueue()
+        self._counter = count()
+        self._lock = Lock()
+        self._shutdown = False
+        self._futures = set()
+        self._threads = []
+        for _ in range(max_workers):
+            thread = Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def command(self, ffmpeg):
+        """Return the argument list which is executed for `ffmpeg`.
+        `threads_per_job` is only applied to
+        :class:`~ffmpegwrapper.FFmpeg` objects, other commands like a
+        :class:`~ffmpegwrapper.template.Job` are executed as they are.
+        """
+        if not (self.threads_per_job and hasattr(ffmpeg, 'iteritems')):
+            return list(ffmpeg.compile())
+        threads = ['-threads', str(self.threads_per_job)]
+        command = [ffmpeg.binary]
+        for container in ffmpeg.iteritems():
+            if isinstance(container, (Input, Output)):
+                command.extend(threads)
+            command.extend(arg for arg in container if arg)
+        return command
+
+    def submit(self, ffmpeg, priority=0):
+        """Schedule `ffmpeg` for execution.
+
+        :param ffmpeg: a :class:`~ffmpegwrapper.FFmpeg` object
+        :param priority: jobs with lower values are started first
+        :return: :class:`JobFuture` which resolves to a :class:`JobResult`
+        """
+        future = JobFuture()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('cannot submit after shutdown')
+            self._futures.add(future)
+            self._queue.put((priority, next(self._counter), future,
+                             self.command(ffmpeg),
+                             getattr(ffmpeg, 'source', None)))
+        return future
+
+    def map(self, ffmpegs, priority=0):
+        """Submit all `ffmpegs` at once and yield their
+        :class:`JobResult` objects in the same order.
+        """
+        futures = [self.submit(ffmpeg, priority) for ffmpeg in ffmpegs]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _work(self):
+        while True:
+            priority, _, future, command, source = self._queue.get()
+            if priority == _STOP:
+                break
+            try:
+                if future.set_running_or_notify_cancel():
+                    self._execute(future, command, source)
+            finally:
+                with self._lock:
+                    self._futures.discard(future)
+
+    def _execute(self, future, command, source):
+        try:
+            process = FFmpegProcess(command, stdin=source,
+                                    timeout=self.timeout,
+                                    stall_timeout=self.stall_timeout)
+            process.queue_wait = time() - future.submitted
+            future.process = process.run()
+            output = list(process.readlines())
+            returncode = process.wait()
+        except BaseException as error:
+            future.set_exception(error)
+        else:
+            if process.stats is not None:
+                self.stats.add(process.stats)
+            future.set_result(JobResult(command, returncode, output,
+                                        process.stats))
+
+    def shutdown(self, wait=True, cancel=False):
+        """Stop accepting jobs and let the workers exit once the queue
+        is processed.
+
+        :param wait: block until all workers have exited
+        :param cancel: cancel pending jobs and terminate running ones
+        """
+        with self._lock:
+            self._shutdown = True
+            if cancel:
+                for future in list(self._futures):
+                    future.terminate()
+            for _ in self._threads:
+                self._queue.put((_STOP, next(self._counter), None, None,
+                                 None))
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.probe
+    ~~~~~~~~~~~~~~~~~~~
+
+    Inspects media files with ffprobe. The results are cached in memory
+    and optionally in a SQLite database, keyed by the path, size and
+    modification time of the file.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import json
+import os
+from collections import namedtuple, OrderedDict
+from subprocess import check_output
+from threading import Lock
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _rate(value):
+    try:
+        numerator, _, denominator = value.partition('/')
+        return float(numerator) / float(denominator or 1)
+    except (AttributeError, ValueError, ZeroDivisionError):
+        return None
+
+
+_STREAM_FIELDS = [
+    ('index', _int), ('codec_type', None), ('codec_name', None),
+    ('width', _int), ('height', _int), ('pix_fmt', None),
+    ('avg_frame_rate', _rate), ('sample_rate', _int), ('channels', _int),
+    ('duration', _float), ('bit_rate', _int), ('nb_frames', _int),
+]
+
+_FORMAT_FIELDS = [
+    ('filename', None), ('format_name', None), ('nb_streams', _int),
+    ('duration', _float), ('size', _int), ('bit_rate', _int),
+]
+
+
+def _build(cls, fields, data):
+    values = dict((name, convert(data.get(name)) if convert
+                   else data.get(name)) for name, convert in fields)
+    return cls(tags=data.get('tags', {}), **values)
+
+
+class Stream(namedtuple('Stream', [name for name, _ in _STREAM_FIELDS] +
+                        ['tags'])):
+    """A stream of a media file as reported by ffprobe. Values which
+    ffprobe does not report are None."""
+
+    __slots__ = ()
+
+
+class Format(namedtuple('Format', [name for name, _ in _FORMAT_FIELDS] +
+                        ['tags'])):
+    """The container format of a media file as reported by ffprobe.
+    Values which ffprobe does not report are None."""
+
+    __slots__ = ()
+
+
+class ProbeResult(namedtuple('ProbeResult', ['format', 'streams'])):
+    """The :class:`Format` and the list of :class:`Stream` objects of a
+    media file."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_json(cls, data):
+        """Create a result from the JSON output of ffprobe."""
+        data = json.loads(data)
+        return cls(_build(Format, _FORMAT_FIELDS, data.get('format', {})),
+                   [_build(Stream, _STREAM_FIELDS, stream)
+                    for stream in data.get('streams', [])])
+
+    @property
+    def duration(self):
+        return self.format.duration
+
+    @property
+    def video_streams(self):
+        return [s for s in self.streams if s.codec_type == 'video']
+
+    @property
+    def audio_streams(self):
+        return [s for s in self.streams if s.codec_type == 'audio']
+
+
+def file_key(file_path):
+    """Return the cache key of `file_path`: the absolute path, the size
+    and the modification time of the file."""
+    stat = os.stat(file_path)
+    mtime = getattr(stat, 'st_mtime_ns', None) or int(stat.st_mtime * 1e9)
+    return os.path.abspath(file_path), stat.st_size, mtime
+
+
+class ProbeCache(object):
+    """LRU cache for :class:`ProbeResult` objects. If `path` is given,
+    the output of ffprobe is also stored in a SQLite database at that
+    path and survives the process.
+
+    :param maxsize: maximal number of results kept in memory
+    :param path: path of the SQLite database. Default is memory only
+    """
+
+    def __init__(self, maxsize=1024, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._database = None
+        if path is not None:
+            import sqlite3
+            self._database = sqlite3.connect(path, check_same_thread=False)
+            self._database.execute(
+                'CREATE TABLE IF NOT EXISTS probe (path TEXT PRIMARY KEY, '
+                'size INTEGER, mtime INTEGER, data TEXT)')
+            self._database.commit()
+
+    def get(self, key):
+        """Return the cached :class:`ProbeResult` for `key` or None."""
+        with self._lock:
+            result = self._entries.pop(key, None)
+            if result is None and self._database is not None:
+                row = self._database.execute(
+                    'SELECT data FROM probe WHERE path = ? AND size = ? '
+                    'AND mtime = ?', key).fetchone()
+                if row is not None:
+                    result = ProbeResult.from_json(row[0])
+            if result is not None:
+                self._remember(key, result)
+            return result
+
+    def set(self, key, data):
+        """Store the JSON output `data` of ffprobe for `key`.
+
+        :return: the :class:`ProbeResult` of `data`
+        """
+        result = ProbeResult.from_json(data)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._remember(key, result)
+            if self._database is not None:
+                self._database.execute(
+                    'INSERT OR REPLACE INTO probe VALUES (?, ?, ?, ?)',
+                    key + (data,))
+                self._database.commit()
+        return result
+
+    def _remember(self, key, result):
+        self._entries[key] = result
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries from memory and from the database."""
+        with self._lock:
+            self._entries.clear()
+            if self._database is not None:
+                self._database.execute('DELETE FROM probe')
+                self._database.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+#: The cache used by :func:`probe` if no other one is given.
+default_cache = ProbeCache()
+
+
+def probe(file_path, ffprobe='ffprobe', cache=default_cache):
+    """Inspect `file_path` with ffprobe.
+
+    :param file_path: Path to the media file
+    :param ffprobe: the ffprobe binary
+    :param cache: a :class:`ProbeCache` or None to always run ffprobe
+    :return: :class:`ProbeResult`
+    """
+    key = file_key(file_path)
+    result = cache.get(key) if cache is not None else None
+    if result is None:
+        data = check_output([
+            ffprobe, '-v', 'error', '-print_format', 'json',
+            '-show_format', '-show_streams', file_path]).decode('utf8')
+        if cache is None:
+            return ProbeResult.from_json(data)
+        result = cache.set(key, data)
+    return result
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.progress
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Parses the machine readable output of ``ffmpeg -progress``.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+from collections import namedtuple
+
+
+class ProgressEvent(namedtuple('ProgressEvent', [
+        'frame', 'fps', 'out_time_us', 'bitrate', 'speed', 'total_size',
+        'end'])):
+    """A block of the progress output.
+
+    The bitrate is given in kbit/s and the speed as factor of realtime.
+    Values FFmpeg reports as ``N/A`` are None. `end` is True for the last
+    event of a process.
+    """
+
+    __slots__ = ()
+
+
+def _number(convert, suffix=''):
+    def parse(value):
+        if suffix and value.endswith(suffix):
+            value = value[:-len(suffix)]
+        try:
+            return convert(value)
+        except ValueError:
+            return None
+    return parse
+
+
+_FIELDS = {
+    'frame': _number(int),
+    'fps': _number(float),
+    'out_time_us': _number(int),
+    'bitrate': _number(float, 'kbits/s'),
+    'speed': _number(float, 'x'),
+    'total_size': _number(int),
+}
+
+
+class ProgressParser(object):
+    """Collects the ``key=value`` lines of the progress output. Every
+    block is closed by a ``progress`` key which creates an event.
+    """
+
+    def __init__(self):
+        self._values = {}
+
+    def feed(self, line):
+        """Feed a single line. Returns a :class:`ProgressEvent` if the
+        line closed a block, otherwise None.
+        """
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            return None
+        value = value.strip()
+        if key == 'progress':
+            values, self._values = self._values, {}
+            return ProgressEvent(end=value == 'end', **dict(
+                (name, values.get(name)) for name in _FIELDS))
+        if key in _FIELDS:
+            self._values[key] = _FIELDS[key](value)
+        elif key == 'out_time_ms' and 'out_time_us' not in self._values:
+            # older versions only report out_time_ms in microseconds
+            self._values['out_time_us'] = _FIELDS['out_time_us'](value)
+        return None
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.reader
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Chunked readers which turn the raw output of a FFmpeg process
+    into text lines.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+import re
+from codecs import getincrementaldecoder
+
+
+#: Default number of bytes read from a pipe at once.
+CHUNK_SIZE = 64 * 1024
+
+_LINE_END = re.compile(u'([\r\n])')
+
+
+class LineSplitter(object):
+    """Decodes chunks of bytes incrementally and splits them into
+    lines. FFmpeg terminates status lines with ``\\r`` and log lines
+    with ``\\n``, so both of them end a line.
+
+    :param encoding: The encoding of the output. Default is utf8
+    """
+
+    def __init__(self, encoding='utf8'):
+        self._decoder = getincrementaldecoder(encoding)('replace')
+        self._pending = u''
+
+    def feed(self, data):
+        """Feed a chunk of bytes and return a list with all lines which
+        were completed by it. The lines keep their line endings.
+        """
+        text = self._pending + self._decoder.decode(data)
+        parts = _LINE_END.split(text)
+        self._pending = parts.pop()
+        return [parts[i] + parts[i + 1] for i in range(0, len(parts), 2)]
+
+    def flush(self):
+        """Return the remaining text without a line ending as a list
+        with one or zero lines.
+        """
+        text = self._pending + self._decoder.decode(b'', True)
+        self._pending = u''
+        if text:
+            return [text]
+        return []
+
+
+def iter_chunks(out, chunk_size=CHUNK_SIZE):
+    """Yield chunks of bytes from `out` until the end of the stream.
+    The chunks are read into one reusable buffer, so a chunk is only
+    valid until the next one is requested.
+
+    :param out: a binary file object, e.g. the stdout of a process
+    :param chunk_size: maximal number of bytes read at once
+    """
+    readinto = getattr(out, 'readinto1', None)
+    if readinto is None:
+        fileno = out.fileno()
+        while True:
+            chunk = os.read(fileno, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        return
+
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        size = readinto(view)
+        if not size:
+            break
+        yield view[:size]
+
+
+def iter_lines(out, chunk_size=CHUNK_SIZE, encoding='utf8'):
+    """Yield the decoded lines of `out` with their line endings.
+
+    :param out: a binary file object, e.g. the stdout of a process
+    :param chunk_size: maximal number of bytes read at once
+    :param encoding: The encoding of the output. Default is utf8
+    """
+    splitter = LineSplitter(encoding)
+    for chunk in iter_chunks(out, chunk_size):
+        for line in splitter.feed(chunk):
+            yield line
+    for line in splitter.flush():
+        yield line
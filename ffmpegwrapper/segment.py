@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.segment
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Transcodes one long input as several segments in parallel and joins
+    them afterwards with the concat demuxer.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+import shutil
+import tempfile
+from bisect import bisect_left
+from multiprocessing import cpu_count
+
+from .ffmpeg import FFmpeg, Input, Output
+from .parameters import Parameter
+from .pool import FFmpegPool
+from .keyframes import keyframe_index
+from .probe import probe
+
+
+def plan_segments(duration, count, keyframes=None):
+    """Split `duration` into at most `count` ranges of similar length.
+    If the sorted `keyframes` are given, e.g. as
+    :class:`~ffmpegwrapper.keyframes.KeyframeIndex`, every range starts
+    at the keyframe which is nearest to its ideal start.
+
+    :return: a list of (start, duration) tuples in seconds
+    """
+    if count < 1:
+        raise ValueError('count must be greater than 0')
+    duration = float(duration)
+    starts = [0.0]
+    for number in range(1, count):
+        start = duration * number / count
+        if keyframes:
+            index = bisect_left(keyframes, start)
+            candidates = keyframes[max(0, index - 1):index + 1]
+            start = min(candidates, key=lambda time: abs(time - start))
+        if starts[-1] < start < duration:
+            starts.append(start)
+    ends = starts[1:] + [duration]
+    return [(start, end - start) for start, end in zip(starts, ends)]
+
+
+class SegmentedTranscode(object):
+    """Transcodes `input` to `output` as `segments` parallel processes.
+
+    Every segment is seeked on the input side and encoded with all
+    containers of `output` (codecs, filters, ...) and the additional
+    `codecs`. The segments are joined with the concat demuxer without
+    encoding them again. Encoders with a priming delay (e.g. AAC) may
+    leave tiny gaps in the audio at the segment borders.
+
+    :param input: the :class:`~ffmpegwrapper.Input` to transcode
+    :param output: the :class:`~ffmpegwrapper.Output` for the result
+    :param codecs: additional containers for every segment
+    :param segments: number of segments. Default is the number of cores
+    :param binary: the ffmpeg binary
+    :param ffprobe: the ffprobe binary used to plan the segments
+    :param workdir: directory for the segments. Default is a new
+                    temporary directory which is removed afterwards
+    """
+
+    def __init__(self, input, output, codecs=(), segments=None,
+                 binary='ffmpeg', ffprobe='ffprobe', workdir=None):
+        self.input = input
+        self.output = output
+        self.codecs = list(codecs)
+        self.segments = segments or cpu_count()
+        self.binary = binary
+        self.ffprobe = ffprobe
+        self.workdir = workdir
+
+    def plan(self, duration=None):
+        """Return the (start, duration) tuples of the segments aligned
+        to the keyframes of the input.
+
+        :param duration: the duration of the input in seconds. Default
+                         is the duration reported by ffprobe
+        :raises ValueError: if the duration is not known
+        """
+        file_path = self.input.file_path
+        if duration is None:
+            duration = probe(file_path, self.ffprobe).duration
+        if duration is None:
+            raise ValueError('ffprobe reports no duration for %s, pass '
+                             'it to plan()' % file_path)
+        return plan_segments(duration, self.segments,
+                             keyframe_index(file_path, self.ffprobe))
+
+    def segment_path(self, workdir, number):
+        extension = os.path.splitext(self.output.file_path)[1]
+        return os.path.join(workdir, 'segment%05d%s' % (number, extension))
+
+    def commands(self, plan, workdir):
+        """Return a :class:`~ffmpegwrapper.FFmpeg` object for every
+        segment of the `plan`."""
+        commands = []
+        for number, (start, duration) in enumerate(plan):
+            input = Input(self.input.file_path, *self.input.container_list)
+            input.seek(start).duration(duration)
+            output = Output(self.segment_path(workdir, number),
+                            *(self.output.container_list + self.codecs))
+            commands.append(FFmpeg(self.binary, input, output))
+        return commands
+
+    def concat_command(self, paths, list_path):
+        """Write the list of segments to `list_path` and return the
+        :class:`~ffmpegwrapper.FFmpeg` object which joins them."""
+        with open(list_path, 'w') as segment_list:
+            for path in paths:
+                segment_list.write("file '%s'\n" %
+                                   path.replace("'", "'\\''"))
+        input = Input(list_path, Parameter('-f', 'concat'),
+                      Parameter('-safe', '0'))
+        output = Output(self.output.file_path, Parameter('-c', 'copy'))
+        if Parameter('-y', None) in self.output:
+            output.overwrite()
+        return FFmpeg(self.binary, input, output)
+
+    def run(self, pool=None, plan=None):
+        """Transcode all segments and join them.
+
+        :param pool: the :class:`~ffmpegwrapper.pool.FFmpegPool` for
+                     the segments. Default is a new pool with one worker
+                     per segment
+        :param plan: use these (start, duration) tuples instead of
+                     :meth:`plan`
+        :return: the :class:`~ffmpegwrapper.pool.JobResult` of the
+                 concat process or of the first segment which failed
+        """
+        if plan is None:
+            plan = self.plan()
+        workdir = self.workdir or tempfile.mkdtemp(prefix='ffmpegwrapper')
+        own_pool = pool is None
+        if own_pool:
+            pool = FFmpegPool(max_workers=len(plan))
+        try:
+            commands = self.commands(plan, workdir)
+            for result in pool.map(commands):
+                if result.returncode != 0:
+                    return result
+            paths = [command[-1].file_path for command in commands]
+            concat = self.concat_command(
+                paths, os.path.join(workdir, 'segments.txt'))
+            return pool.submit(concat).result()
+        finally:
+            if own_pool:
+                pool.shutdown()
+            if self.workdir is None:
+                shutil.rmtree(workdir, ignore_errors=True)
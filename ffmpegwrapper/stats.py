@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.stats
+    ~~~~~~~~~~~~~~~~~~~
+
+    Collects what a FFmpeg process cost: wall time, CPU time, memory
+    and I/O.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+import re
+import sys
+from collections import namedtuple
+from threading import Lock
+
+
+class ProcessStats(namedtuple('ProcessStats', [
+        'wall_time', 'user_time', 'system_time', 'max_rss', 'read_bytes',
+        'write_bytes', 'speed'])):
+    """The resources a finished process used.
+
+    Times are in seconds and `max_rss` is the peak resident memory in
+    bytes. `read_bytes` and `write_bytes` count everything the process
+    read and wrote, including pipes. `speed` is the encoded duration
+    divided by the wall time. Values which are not available on the
+    platform are None.
+    """
+
+    __slots__ = ()
+
+
+_TIME = re.compile(r'time=\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+
+
+def encoded_seconds(lines):
+    """Return the ``time=`` of the last status line in `lines` in
+    seconds or None."""
+    for line in reversed(lines):
+        match = _TIME.search(line)
+        if match:
+            hours, minutes, seconds = match.groups()
+            return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    return None
+
+
+def read_io(pid):
+    """Return the characters read and written by `pid` from
+    ``/proc/<pid>/io`` or (None, None) if it is not available."""
+    try:
+        with open('/proc/%d/io' % pid) as io:
+            values = dict(line.split(':', 1) for line in io if ':' in line)
+        return int(values['rchar']), int(values['wchar'])
+    except (EnvironmentError, KeyError, ValueError):
+        return None, None
+
+
+def _exitcode(status):
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def wait_with_usage(process):
+    """Wait for the exit of the :class:`subprocess.Popen` `process`
+    like its `wait` method, but collect the resource usage of the child
+    with :func:`os.wait4` and its I/O counters before it is reaped.
+
+    :return: a tuple of the :class:`resource.struct_rusage` and the
+             result of :func:`read_io`. The usage is None if it is not
+             available, e.g. because the process was already reaped
+    """
+    if not hasattr(os, 'wait4'):
+        process.wait()
+        return None, (None, None)
+    io = (None, None)
+    if hasattr(os, 'waitid'):
+        try:
+            # Wait without reaping, the counters are gone afterwards.
+            os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            io = read_io(process.pid)
+        except OSError:
+            pass
+    # Popen.poll() skips its check while the lock is held, so it cannot
+    # reap the process in between.
+    lock = getattr(process, '_waitpid_lock', None) or Lock()
+    with lock:
+        if process.returncode is None:
+            try:
+                _, status, usage = os.wait4(process.pid, 0)
+            except OSError:
+                usage = None
+            else:
+                process.returncode = _exitcode(status)
+                return usage, io
+    process.wait()
+    return None, io
+
+
+def process_stats(wall_time, usage=None, io=(None, None), encoded=None):
+    """Create :class:`ProcessStats` from the results of
+    :func:`wait_with_usage` and the encoded duration in seconds."""
+    user_time = system_time = max_rss = None
+    if usage is not None:
+        user_time, system_time = usage.ru_utime, usage.ru_stime
+        # Linux reports kilobytes, macOS bytes.
+        max_rss = usage.ru_maxrss
+        if sys.platform != 'darwin':
+            max_rss *= 1024
+    speed = None
+    if encoded is not None and wall_time:
+        speed = encoded / wall_time
+    return ProcessStats(wall_time, user_time, system_time, max_rss,
+                        io[0], io[1], speed)
+
+
+class StatsTotal(object):
+    """Adds up the :class:`ProcessStats` of many processes. Values which
+    are None are skipped, `max_rss` is the maximum of all processes.
+    It is safe to :meth:`add` from several threads.
+    """
+
+    _SUMS = ('wall_time', 'user_time', 'system_time', 'read_bytes',
+             'write_bytes')
+
+    def __init__(self):
+        self._lock = Lock()
+        self.jobs = 0
+        self.wall_time = 0.0
+        self.user_time = 0.0
+        self.system_time = 0.0
+        self.max_rss = 0
+        self.read_bytes = 0
+        self.write_bytes = 0
+        self._speed_total = 0.0
+        self._speed_jobs = 0
+
+    def add(self, stats):
+        """Add the :class:`ProcessStats` of a finished process."""
+        with self._lock:
+            self.jobs += 1
+            for name in self._SUMS:
+                value = getattr(stats, name)
+                if value is not None:
+                    setattr(self, name, getattr(self, name) + value)
+            if stats.max_rss is not None:
+                self.max_rss = max(self.max_rss, stats.max_rss)
+            if stats.speed is not None:
+                self._speed_total += stats.speed
+                self._speed_jobs += 1
+
+    @property
+    def cpu_time(self):
+        """User and system time of all processes."""
+        return self.user_time + self.system_time
+
+    @property
+    def speed(self):
+        """Average speed of the processes which reported one or None."""
+        if not self._speed_jobs:
+            return None
+        return self._speed_total / self._speed_jobs
+
+    def as_dict(self):
+        """Return the totals as dict, e.g. for a JSON report."""
+        with self._lock:
+            values = dict((name, getattr(self, name)) for name in
+                          ('jobs', 'max_rss') + self._SUMS)
+            values['speed'] = self.speed
+        values['cpu_time'] = values['user_time'] + values['system_time']
+        return values
+
+    def __repr__(self):
+        return "<{cls} {values}>".format(
+            cls=self.__class__.__name__, values=self.as_dict())
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.template
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Command templates with named placeholders to create many similar
+    commands cheaply.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+from string import Template
+
+from .ffmpeg import FFmpegProcess
+
+
+class CommandTemplate(object):
+    """A compiled command with named placeholders in the syntax of
+    :class:`string.Template`::
+
+        output = Output('${output}', VideoCodec('libx264').bitrate('${rate}'))
+        template = CommandTemplate(FFmpeg('ffmpeg', Input('${input}'), output))
+        job = template(input='/old.mkv', output='/new.mp4', rate='3000k')
+
+    The arguments are split once into static ones and the ones with
+    placeholders. Creating a :class:`Job` only stores the values, the
+    arguments are built when they are needed by copying the static
+    arguments and substituting the others.
+
+    :param command: a :class:`~ffmpegwrapper.FFmpeg` object or any
+                    sequence of arguments
+    """
+
+    def __init__(self, command):
+        compile = getattr(command, 'compile', None)
+        self.argv = tuple(compile() if compile else command)
+        names = []
+        self._slots = []
+        for index, arg in enumerate(self.argv):
+            template = Template(arg)
+            found = [match.group('named') or match.group('braced')
+                     for match in Template.pattern.finditer(arg)
+                     if match.group('named') or match.group('braced')]
+            if not found:
+                if '$$' in arg:
+                    self._slots.append((index, None, template))
+                continue
+            for name in found:
+                if name not in names:
+                    names.append(name)
+            if arg in ('$' + found[0], '${%s}' % found[0]):
+                self._slots.append((index, found[0], None))
+            else:
+                self._slots.append((index, None, template))
+        #: The names of the placeholders in the order of their appearance.
+        self.names = tuple(names)
+
+    def render(self, values):
+        """Return the argument list for a dict of `values`."""
+        argv = list(self.argv)
+        for index, name, template in self._slots:
+            if template is None:
+                argv[index] = str(values[name])
+            else:
+                argv[index] = template.substitute(values)
+        return argv
+
+    def __call__(self, **values):
+        """Create a :class:`Job` with a value for every placeholder."""
+        try:
+            ordered = tuple(values.pop(name) for name in self.names)
+        except KeyError as error:
+            raise TypeError('Missing value for placeholder %s' % error)
+        if values:
+            raise TypeError('Unknown placeholders: %s' %
+                            ', '.join(sorted(values)))
+        return Job(self, ordered)
+
+
+class Job(object):
+    """A :class:`CommandTemplate` with values for its placeholders. It
+    only keeps a reference to the template and a tuple of the values.
+    """
+
+    __slots__ = ('template', 'values')
+
+    def __init__(self, template, values):
+        self.template = template
+        self.values = values
+
+    def compile(self):
+        """Return the arguments of the command as a tuple."""
+        return tuple(self.template.render(
+            dict(zip(self.template.names, self.values))))
+
+    def run(self):
+        """Executes the command.
+
+        :return: :class:`~ffmpegwrapper.ffmpeg.FFmpegProcess` object
+                 with `run()` invoked
+        """
+        return FFmpegProcess(self).run()
+
+    def __iter__(self):
+        return iter(self.compile())
+
+    def __str__(self):
+        return " ".join(self.compile())
+
+    def __repr__(self):
+        return "<{cls} {opts}>".format(
+            opts=list(self.compile()), cls=self.__class__.__name__)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.thumbnails
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Extracts many thumbnails of a video with a single FFmpeg process,
+    as numbered images or as sprite sheets with a WebVTT index.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+import re
+from collections import namedtuple
+
+from .codec import NO_AUDIO
+from .ffmpeg import FFmpeg, Input, Output
+from .filter import VideoFilter
+from .parameters import Parameter
+
+
+#: A thumbnail every `interval` seconds.
+INTERVAL = 'interval'
+#: A thumbnail at every scene change above `threshold`.
+SCENE = 'scene'
+#: A thumbnail of every keyframe. Only the keyframes are decoded.
+KEYFRAMES = 'keyframes'
+
+MODES = (INTERVAL, SCENE, KEYFRAMES)
+
+_PTS_TIME = re.compile(r'pts_time:\s*(-?\d+(?:\.\d+)?(?:e-?\d+)?)')
+_DURATION = re.compile(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+
+
+class ThumbnailResult(namedtuple('ThumbnailResult', [
+        'returncode', 'times', 'duration', 'output'])):
+    """The result of :meth:`Thumbnails.run`: the returncode, the
+    timestamps of the thumbnails in seconds, the duration of the input
+    in seconds or None if FFmpeg did not log it and the output lines of
+    FFmpeg."""
+
+    __slots__ = ()
+
+
+def parse_thumbnail_log(lines):
+    """Return the timestamps logged by the ``showinfo`` filter and the
+    duration of the first input in `lines`."""
+    times = []
+    duration = None
+    for line in lines:
+        if 'showinfo' in line:
+            match = _PTS_TIME.search(line)
+            if match:
+                times.append(float(match.group(1)))
+        elif duration is None:
+            match = _DURATION.search(line)
+            if match:
+                hours, minutes, seconds = match.groups()
+                duration = (int(hours) * 3600 + int(minutes) * 60 +
+                            float(seconds))
+    return times, duration
+
+
+def vtt_timestamp(seconds):
+    """Format `seconds` like ``01:02:03.456``."""
+    milliseconds = int(round(seconds * 1000))
+    return '%02d:%02d:%02d.%03d' % (
+        milliseconds // 3600000, milliseconds // 60000 % 60,
+        milliseconds // 1000 % 60, milliseconds % 1000)
+
+
+def write_vtt(file_path, times, end, image_url, size, columns, rows):
+    """Write a WebVTT index of sprite sheets to `file_path`. Every
+    thumbnail is shown from its timestamp until the next one.
+
+    :param times: the timestamps of the thumbnails in seconds
+    :param end: the end of the last cue in seconds
+    :param image_url: the URL of the sheets in the cues. A pattern like
+                      ``sprite%03d.jpg`` is filled in with the number of
+                      the sheet, starting with 1 like FFmpeg does
+    :param size: (width, height) of a thumbnail
+    :param columns: thumbnails per row of a sheet
+    :param rows: rows of a sheet
+    """
+    width, height = size
+    per_sheet = columns * rows
+    ends = list(times[1:]) + [max(end, times[-1])] if times else []
+    with open(file_path, 'w') as vtt:
+        vtt.write('WEBVTT\n')
+        for index, (start, stop) in enumerate(zip(times, ends)):
+            sheet, position = divmod(index, per_sheet)
+            url = image_url
+            if '%' in image_url:
+                url = image_url % (sheet + 1)
+            vtt.write('\n%s --> %s\n%s#xywh=%d,%d,%d,%d\n' % (
+                vtt_timestamp(start), vtt_timestamp(stop), url,
+                position % columns * width, position // columns * height,
+                width, height))
+
+
+class Thumbnails(object):
+    """Builds one FFmpeg command which extracts all thumbnails of
+    `input` instead of one process per thumbnail::
+
+        thumbnails = Thumbnails(Input('/old.mkv'), INTERVAL, interval=10)
+        thumbnails.run(thumbnails.images('/thumb%04d.jpg'))
+        thumbnails.sprite_sheet('/sprite.jpg', '/sprite.vtt')
+
+    The frames are picked with the ``select`` filter, or in the
+    :data:`KEYFRAMES` mode with ``-skip_frame nokey``, which skips
+    decoding everything but the keyframes and is by far the fastest
+    mode. The ``showinfo`` filter logs the timestamp of every
+    thumbnail for the WebVTT index.
+
+    :param input: the :class:`~ffmpegwrapper.Input` of the video
+    :param mode: :data:`INTERVAL`, :data:`SCENE` or :data:`KEYFRAMES`
+    :param interval: seconds between the thumbnails of :data:`INTERVAL`
+    :param threshold: the scene score between 0 and 1 which counts as
+                      scene change for :data:`SCENE`
+    :param size: (width, height) of the thumbnails. -1 keeps the aspect
+                 ratio, but sprite sheets need both. Default is the
+                 size of the video
+    :param binary: the ffmpeg binary
+    """
+
+    def __init__(self, input, mode=INTERVAL, interval=10, threshold=0.4,
+                 size=None, binary='ffmpeg'):
+        if mode not in MODES:
+            raise ValueError('Unknown mode %r, expected one of %s' %
+                             (mode, ', '.join(MODES)))
+        self.input = input
+        self.mode = mode
+        self.interval = interval
+        self.threshold = threshold
+        self.size = size
+        self.binary = binary
+
+    def filters(self):
+        """Return the :class:`~ffmpegwrapper.VideoFilter` which selects
+        and scales the thumbnails."""
+        filters = VideoFilter()
+        if self.mode == INTERVAL:
+            filters.select("'isnan(prev_selected_t)+"
+                           "gte(t-prev_selected_t,%s)'" % self.interval)
+        elif self.mode == SCENE:
+            filters.select("'gt(scene,%s)'" % self.threshold)
+        filters.showinfo()
+        if self.size is not None:
+            filters.scale(*self.size)
+        return filters
+
+    def _input(self):
+        if self.mode != KEYFRAMES:
+            return self.input
+        source = self.input.source
+        input = Input(self.input.file_path if source is None else source,
+                      Parameter('-skip_frame', 'nokey'),
+                      *self.input.container_list)
+        input.seek_position = self.input.seek_position
+        input.seek_duration = self.input.seek_duration
+        input.seek_offset = self.input.seek_offset
+        return input
+
+    def _command(self, file_path, filters, *containers):
+        output = Output(file_path, NO_AUDIO, filters,
+                        Parameter('-vsync', 'vfr'), *containers)
+        return FFmpeg(self.binary, self._input(), output.overwrite())
+
+    def images(self, file_path):
+        """Return the :class:`~ffmpegwrapper.FFmpeg` object which writes
+        every thumbnail to its own image.
+
+        :param file_path: a pattern like ``thumb%04d.jpg``
+        """
+        return self._command(file_path, self.filters())
+
+    def sprite(self, file_path, columns=10, rows=10):
+        """Return the :class:`~ffmpegwrapper.FFmpeg` object which tiles
+        the thumbnails into sprite sheets of `columns` x `rows`.
+
+        :param file_path: a pattern like ``sprite%03d.jpg`` for as many
+                          sheets as needed, or a path for only the first
+                          sheet. FFmpeg then stops after the first sheet
+        """
+        if self.size is None or min(self.size) <= 0:
+            raise ValueError('Sprite sheets need the width and height of '
+                             'the thumbnails')
+        containers = []
+        if '%' not in file_path:
+            containers.append(Parameter('-frames:v', '1'))
+        return self._command(file_path, self.filters().tile(columns, rows),
+                             *containers)
+
+    def run(self, ffmpeg):
+        """Execute a command of :meth:`images` or :meth:`sprite`.
+
+        :return: :class:`ThumbnailResult`
+        """
+        process = ffmpeg.run()
+        output = list(process.readlines())
+        returncode = process.wait()
+        times, duration = parse_thumbnail_log(output)
+        return ThumbnailResult(returncode, times, duration, output)
+
+    def sprite_sheet(self, file_path, vtt_path, columns=10, rows=10,
+                     image_url=None):
+        """Write sprite sheets and their WebVTT index with one process.
+        The index is only written if FFmpeg succeeds.
+
+        :param file_path: the path or pattern of the sheets, see
+                          :meth:`sprite`
+        :param vtt_path: the path of the WebVTT file
+        :param image_url: the URL of the sheets in the index. Default is
+                          the file name of `file_path`
+        :return: :class:`ThumbnailResult` with the timestamps of the
+                 thumbnails on the sheets
+        """
+        result = self.run(self.sprite(file_path, columns, rows))
+        times, end = result.times, result.duration
+        if '%' not in file_path and len(times) > columns * rows:
+            times, end = times[:columns * rows], times[columns * rows]
+        elif self.mode == INTERVAL and times:
+            end = min(end or float('inf'), times[-1] + self.interval)
+        result = result._replace(times=times)
+        if result.returncode == 0:
+            if end is None:
+                end = times[-1] if times else 0
+            if image_url is None:
+                image_url = os.path.basename(file_path)
+            write_vtt(vtt_path, times, end, image_url, self.size, columns,
+                      rows)
+        return result
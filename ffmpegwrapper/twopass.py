@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+    ffmpegwrapper.twopass
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Builds and runs both passes of a two-pass encode from a single
+    command.
+
+    :copyright: (c) 2014 by Mathias Koehler.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import glob
+import os
+import tempfile
+from concurrent.futures import Future
+from uuid import uuid4
+
+from .codec import AudioCodec, VideoCodec, NO_AUDIO
+from .ffmpeg import FFmpeg, Output
+from .filter import AudioFilter
+from .parameters import Parameter
+from .pool import JobResult
+
+
+#: Output options which only concern the audio and are left out of the
+#: first pass.
+AUDIO_OPTIONS = frozenset(['-acodec', '-c:a', '-codec:a', '-ab', '-b:a',
+                           '-ar', '-ac', '-aq', '-q:a', '-af', '-filter:a'])
+
+#: Options which make the first pass of an encoder as fast as possible.
+#: x264 and x265 already use a fast first pass on their own.
+FIRST_PASS_OPTIONS = {
+    'libvpx': [('-speed', '4')],
+    'libvpx-vp9': [('-speed', '4')],
+    'libaom-av1': [('-cpu-used', '8')],
+}
+
+_PASS1_PRIORITY = 1
+_PASS2_PRIORITY = 0
+
+
+def passlog_directory():
+    """Return ``/dev/shm`` if it is writable, otherwise the temporary
+    directory. The pass logs are small and read and written a lot."""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+class TwoPass(object):
+    """Derives both passes from `ffmpeg`, a command with one
+    :class:`~ffmpegwrapper.Output` and a
+    :class:`~ffmpegwrapper.VideoCodec` with a target bitrate::
+
+        video = VideoCodec('libvpx-vp9').bitrate('2M')
+        ffmpeg = FFmpeg('ffmpeg', Input('/old.mkv'),
+                        Output('/new.webm', video, AudioCodec('libopus')))
+        result = TwoPass(ffmpeg).run()
+
+    The first pass writes no output and no audio, the second pass is
+    `ffmpeg` itself. Each job gets its own pass log file, which is
+    removed afterwards.
+
+    :param ffmpeg: the :class:`~ffmpegwrapper.FFmpeg` object
+    :param directory: directory of the pass log. Default is
+                      :func:`passlog_directory`
+    """
+
+    def __init__(self, ffmpeg, directory=None):
+        outputs = [container for container in ffmpeg.iteritems()
+                   if isinstance(container, Output)]
+        if len(outputs) != 1:
+            raise ValueError('Two-pass encoding needs exactly one output')
+        self.ffmpeg = ffmpeg
+        self.output = outputs[0]
+        self.passlog = os.path.join(directory or passlog_directory(),
+                                    'ffmpeg2pass-' + uuid4().hex)
+
+    def _first_pass_options(self):
+        for container in self.output.iteritems():
+            if isinstance(container, VideoCodec):
+                return [Parameter(key, value) for key, value in
+                        FIRST_PASS_OPTIONS.get(container.name, ())]
+        return []
+
+    def _pass_options(self, number):
+        return [Parameter('-pass', str(number)),
+                Parameter('-passlogfile', self.passlog)]
+
+    def first_pass(self):
+        """Return the :class:`~ffmpegwrapper.FFmpeg` object of the first
+        pass."""
+        containers = []
+        for container in self.output.iteritems():
+            if isinstance(container, (AudioCodec, AudioFilter)):
+                continue
+            if isinstance(container, Parameter) and \
+                    container.name in AUDIO_OPTIONS:
+                continue
+            containers.append(container)
+        containers.extend(self._pass_options(1))
+        containers.extend(self._first_pass_options())
+        containers.extend([NO_AUDIO, Parameter('-f', 'null')])
+        output = Output(os.devnull, *containers)
+        others = [container for container in self.ffmpeg.iteritems()
+                  if container is not self.output]
+        return FFmpeg(self.ffmpeg.binary, *(others + [output]))
+
+    def second_pass(self):
+        """Return the :class:`~ffmpegwrapper.FFmpeg` object of the
+        second pass."""
+        output = Output(self.output.file_path,
+                        *(list(self.output.iteritems()) +
+                          self._pass_options(2)))
+        containers = [output if container is self.output else container
+                      for container in self.ffmpeg.iteritems()]
+        return FFmpeg(self.ffmpeg.binary, *containers)
+
+    def cleanup(self):
+        """Remove the pass log files."""
+        for path in glob.glob(self.passlog + '*'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _execute(self, ffmpeg):
+        process = ffmpeg.run()
+        output = list(process.readlines())
+        returncode = process.wait()
+        return JobResult(process.command, returncode, output, process.stats)
+
+    def run(self):
+        """Run both passes one after the other.
+
+        :return: the :class:`~ffmpegwrapper.pool.JobResult` of the
+                 second pass or of the first one if it failed
+        """
+        try:
+            result = self._execute(self.first_pass())
+            if result.returncode == 0:
+                result = self._execute(self.second_pass())
+            return result
+        finally:
+            self.cleanup()
+
+
+class TwoPassFuture(Future):
+    """A :class:`concurrent.futures.Future` for both passes of a job
+    submitted with :func:`submit_two_pass`. :attr:`job` is the
+    :class:`~ffmpegwrapper.pool.JobFuture` of the current pass.
+    Cancelling the future cancels the pending pass, like with a
+    :class:`~ffmpegwrapper.pool.JobFuture` it fails while a pass runs.
+    """
+
+    def __init__(self):
+        Future.__init__(self)
+        self.job = None
+
+    def cancel(self):
+        job = self.job
+        if job is not None and job.running():
+            return False
+        if not Future.cancel(self):
+            return False
+        if job is not None:
+            job.cancel()
+        if self.job is not job:
+            self.job.cancel()
+        return True
+
+    def terminate(self):
+        """Cancel the job if its pass is pending or terminate the
+        process of the running pass.
+
+        :return: True if the job was cancelled or terminated
+        """
+        if self.cancel():
+            return True
+        job = self.job
+        return job is not None and job.terminate()
+
+
+def submit_two_pass(pool, ffmpegs, directory=None):
+    """Submit two-pass encodes of `ffmpegs` to an
+    :class:`~ffmpegwrapper.pool.FFmpegPool`. All first passes are
+    submitted at once. When one is done its second pass is submitted
+    with a higher priority, so it starts on the next free worker while
+    the remaining first passes go on.
+
+    :param directory: directory of the pass logs
+    :return: a list of :class:`TwoPassFuture` objects which resolve to
+             the :class:`~ffmpegwrapper.pool.JobResult` of the second
+             pass or of the first one if it failed
+    """
+    futures = []
+    for ffmpeg in ffmpegs:
+        job = TwoPass(ffmpeg, directory)
+        future = TwoPassFuture()
+        future.job = pool.submit(job.first_pass(), _PASS1_PRIORITY)
+        future.job.add_done_callback(_first_pass_done(pool, job, future))
+        futures.append(future)
+    return futures
+
+
+def _finish(job, future, pass_future):
+    job.cleanup()
+    if pass_future.cancelled():
+        future.cancel()
+    elif future.set_running_or_notify_cancel():
+        try:
+            future.set_result(pass_future.result())
+        except BaseException as error:
+            future.set_exception(error)
+
+
+def _first_pass_done(pool, job, future):
+    def callback(first):
+        if first.cancelled() or future.cancelled() or \
+                first.exception() is not None or \
+                first.result().returncode != 0:
+            _finish(job, future, first)
+            return
+        try:
+            second = pool.submit(job.second_pass(), _PASS2_PRIORITY)
+        except BaseException as error:
+            job.cleanup()
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+            return
+        future.job = second
+        if future.cancelled():
+            second.cancel()
+        second.add_done_callback(lambda second: _finish(job, future, second))
+    return callback
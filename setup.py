@@ -31,8 +31,10 @@ setup(
     keywords='Video Convert Ffmpeg',
     long_description=__doc__,
     license='BSD',
+    install_requires=['futures; python_version < "3"'],
     test_suite='test',
     tests_require='mock>=0.7.2',
+    extras_require={'numpy': ['numpy']},
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',
         'Intended Audience :: Developers',
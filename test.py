@@ -1,12 +1,51 @@
 # -*- coding: utf8 -*-
 
+import gc
+import os
+import pickle
+import shutil
+import signal
+import stat
+from subprocess import CalledProcessError, PIPE
+import sys
+import tempfile
+import time
 import unittest
+from copy import deepcopy
+from io import BytesIO
 
-from mock import patch
+try:
+    from Queue import Full
+    from urllib2 import urlopen
+except ImportError:
+    from queue import Full
+    from urllib.request import urlopen
+
+from mock import Mock, patch
 
 from ffmpegwrapper import FFmpeg, Input, Output, \
-    VideoCodec, AudioCodec, VideoFilter
+    VideoCodec, AudioCodec, VideoFilter, AudioFilter, FilterGraph
+from ffmpegwrapper.cache import TranscodeCache, fingerprint, job_key
+from ffmpegwrapper.buffer import OutputQueue, DROP_OLDEST, DISCARD
+from ffmpegwrapper.ffmpeg import FFmpegProcess
+from ffmpegwrapper.frames import FrameReader, FrameWriter, numpy
 from ffmpegwrapper.parameters import Parameter
+from ffmpegwrapper.pool import FFmpegPool
+from ffmpegwrapper.ladder import Ladder
+from ffmpegwrapper import metrics
+from ffmpegwrapper.metrics import MetricsRegistry, MetricsObserver, \
+    add_observer, remove_observer
+from ffmpegwrapper.template import CommandTemplate
+from ffmpegwrapper.thumbnails import Thumbnails, INTERVAL, KEYFRAMES, \
+    SCENE, vtt_timestamp
+from ffmpegwrapper.twopass import TwoPass, submit_two_pass
+from ffmpegwrapper.stats import ProcessStats, StatsTotal
+from ffmpegwrapper.segment import SegmentedTranscode, plan_segments
+from ffmpegwrapper.keyframes import KeyframeIndex, KeyframeIndexCache, \
+    keyframe_index, scan_keyframes
+from ffmpegwrapper.probe import ProbeCache, probe
+from ffmpegwrapper.progress import ProgressParser, ProgressEvent
+from ffmpegwrapper.reader import LineSplitter, iter_lines
 
 
 class FFmpegTestCase(unittest.TestCase):
@@ -14,19 +53,17 @@ class FFmpegTestCase(unittest.TestCase):
     def setUp(self):
         self.patcher = patch('ffmpegwrapper.ffmpeg.Popen')
         popen = self.patcher.start()
+        waiter = patch('ffmpegwrapper.ffmpeg.wait_with_usage',
+                       return_value=(None, (None, None)))
+        waiter.start()
+        self.addCleanup(waiter.stop)
         self.instance = popen.return_value
 
-        read_value = bytearray(b'this is a line\nthis too\n')
-        poll = lambda: None if read_value else 0
-
-        def read(*args):
-            try:
-                return bytearray([read_value.pop(0)])
-            except IndexError:
-                return b''
+        stdout = BytesIO(b'this is a line\nthis too\n')
+        poll = lambda: 0 if stdout.closed else None
 
         self.instance.poll.side_effect = poll
-        self.instance.stdout.read.side_effect = read
+        self.instance.stdout = stdout
 
     def test_input_interface(self):
         input = Input('/old')
@@ -41,6 +78,29 @@ class FFmpegTestCase(unittest.TestCase):
         input.add_formatparam('-vf', 'x11grab')
         self.assertEqual(input.container_list, [parameter])
 
+    def test_input_seek(self):
+        input = Input('/old', Parameter('-r', '25')).duration('0:30')
+        input.seek(3600)
+        self.assertEqual(list(input), ['-ss', '3600.0', '-t', '30.0',
+                                       '-r', '25', '-i', '/old'])
+        input.seek('01:00:05.5')
+        self.assertEqual(list(input)[:2], ['-ss', '3605.5'])
+        self.assertRaises(ValueError, input.seek, -1)
+        self.assertRaises(ValueError, input.seek, '1:xx')
+        self.assertRaises(ValueError,
+                          Input('/old', Parameter('-ss', '5')).seek, 10)
+
+        output = Output('/new')
+        input = Input('/old').seek(3600, output, margin=15).duration(30)
+        self.assertEqual(list(FFmpeg('ffmpeg', input, output)), [
+            'ffmpeg', '-ss', '3585.0', '-t', '45.0', '-i', '/old',
+            '-ss', '15.0', '--', '/new'])
+        Input('/old').seek(4, output, margin=15)
+        self.assertEqual(list(output), ['-ss', '4.0', '--', '/new'])
+        input = Input('/old').seek(0.00005).duration(1e20)
+        self.assertEqual(list(input)[:4], ['-ss', '0.00005',
+                                           '-t', '100000000000000000000.0'])
+
     def test_output_interface(self):
         output = Output('/new')
         self.assertEqual(list(output), ['/new'])
@@ -85,6 +145,1021 @@ class FFmpegTestCase(unittest.TestCase):
         self.patcher.stop()
 
 
+class CompileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.codec = VideoCodec('libx264')
+        self.output = Output('/new', self.codec)
+        self.ffmpeg = FFmpeg('ffmpeg', Input('/old'), self.output)
+
+    def test_compile(self):
+        compiled = self.ffmpeg.compile()
+        self.assertEqual(compiled, ('ffmpeg', '-i', '/old', '-vcodec',
+                                    'libx264', '--', '/new'))
+        self.assertTrue(self.ffmpeg.compile() is compiled)
+        self.assertEqual(list(self.ffmpeg), list(compiled))
+        self.assertEqual(str(self.ffmpeg), ' '.join(compiled))
+
+    def test_invalidate_nested(self):
+        self.ffmpeg.compile()
+        self.codec.bitrate('300k')
+        self.assertEqual(self.ffmpeg.compile()[3:7],
+                         ('-vcodec', 'libx264', '-b', '300k'))
+        self.codec.name = 'libx265'
+        self.assertEqual(self.ffmpeg.compile()[4], 'libx265')
+
+    def test_invalidate_sequence_methods(self):
+        self.ffmpeg.compile()
+        self.ffmpeg.add_parameter('-y', None)
+        self.assertEqual(self.ffmpeg.compile()[:2], ('ffmpeg', '-y'))
+        self.output.file_path = '/other'
+        self.assertEqual(self.ffmpeg.compile()[-1], '/other')
+        del self.output[0]
+        self.assertEqual(self.ffmpeg.compile()[-3:], ('/old', '--', '/other'))
+        self.output[:] = [AudioCodec('aac')]
+        self.assertEqual(self.ffmpeg.compile()[-4:-2], ('-acodec', 'aac'))
+        self.ffmpeg.pop()
+        self.assertEqual(self.ffmpeg.compile(), ('ffmpeg', '-y', '-i', '/old'))
+
+    def test_parents(self):
+        commands = [FFmpeg('ffmpeg', Output('/new%d' % number, self.codec))
+                    for number in range(100)]
+        self.assertEqual(len(self.codec._parents), 101)
+        del commands
+        gc.collect()
+        self.assertEqual(len(self.codec._parents), 1)
+
+        self.ffmpeg.compile()
+        del self.output[0]
+        self.assertEqual(len(self.codec._parents), 0)
+        compiled = self.ffmpeg.compile()
+        self.codec.bitrate('1k')
+        self.assertTrue(self.ffmpeg.compile() is compiled)
+
+        self.output[:] = [self.codec, self.codec]
+        self.output[0] = AudioCodec('aac')
+        self.assertEqual(len(self.codec._parents), 1)
+        self.output[1] = AudioCodec('ac3')
+        self.assertEqual(len(self.codec._parents), 0)
+
+    def test_pickle(self):
+        self.ffmpeg.compile()
+        ffmpeg = pickle.loads(pickle.dumps(self.ffmpeg))
+        self.assertEqual(ffmpeg.compile(), self.ffmpeg.compile())
+        ffmpeg[1][0].bitrate('1k')
+        self.assertEqual(ffmpeg.compile()[5:7], ('-b', '1k'))
+
+    def test_deepcopy(self):
+        self.ffmpeg.compile()
+        ffmpeg = deepcopy(self.ffmpeg)
+        ffmpeg[1][0].bitrate('1k')
+        self.assertEqual(ffmpeg.compile()[5:7], ('-b', '1k'))
+        self.assertEqual(self.ffmpeg.compile(), ('ffmpeg', '-i', '/old',
+                                                 '-vcodec', 'libx264',
+                                                 '--', '/new'))
+        self.codec.bitrate('2k')
+        self.assertEqual(ffmpeg.compile()[5:7], ('-b', '1k'))
+
+        graph = FilterGraph()
+        pad = graph.filter(graph.stream('0:v'), VideoFilter().scale(640))
+        copied = deepcopy(FFmpeg('ffmpeg', graph, Output('/new',
+                                                         graph.map(pad))))
+        self.assertEqual(copied.compile()[1:3],
+                         ('-filter_complex', '[0:v]scale=640:-1[p0]'))
+
+
+class CommandTemplateTestCase(unittest.TestCase):
+
+    def setUp(self):
+        videofilter = VideoFilter().scale('${width}', -1)
+        output = Output('${output}', videofilter,
+                        VideoCodec('libx264').bitrate('${rate}'))
+        self.template = CommandTemplate(
+            FFmpeg('ffmpeg', Input('${input}'), output))
+
+    def test_instantiate(self):
+        self.assertEqual(self.template.names,
+                         ('input', 'width', 'rate', 'output'))
+        job = self.template(input='/old', output='/new', rate='3000k',
+                            width=1280)
+        self.assertEqual(job.values, ('/old', 1280, '3000k', '/new'))
+        self.assertEqual(list(job), [
+            'ffmpeg', '-i', '/old', '-vf', 'scale=1280:-1',
+            '-vcodec', 'libx264', '-b', '3000k', '--', '/new'])
+        self.assertFalse(hasattr(job, '__dict__'))
+
+    def test_invalid_values(self):
+        self.assertRaises(TypeError, self.template, input='/old')
+        self.assertRaises(TypeError, self.template, input='/old',
+                          output='/new', rate=1, width=1, height=2)
+
+    def test_pool(self):
+        template = CommandTemplate(python_command('print(${value})'))
+        with FFmpegPool(max_workers=2, threads_per_job=1) as pool:
+            results = list(pool.map(template(value=i) for i in range(3)))
+        self.assertEqual([result.output for result in results],
+                         [['0'], ['1'], ['2']])
+
+
+class ReaderTestCase(unittest.TestCase):
+
+    def test_line_splitter(self):
+        splitter = LineSplitter()
+        self.assertEqual(splitter.feed(b'frame=  1\rframe='), ['frame=  1\r'])
+        self.assertEqual(splitter.feed(b'  2\r\nlog'), ['frame=  2\r', '\n'])
+        self.assertEqual(splitter.flush(), ['log'])
+        self.assertEqual(splitter.flush(), [])
+
+    def test_line_splitter_multibyte(self):
+        splitter = LineSplitter()
+        data = u'K\xf6hler\n'.encode('utf8')
+        self.assertEqual(splitter.feed(data[:2]), [])
+        self.assertEqual(splitter.feed(data[2:]), [u'K\xf6hler\n'])
+
+    def test_iter_lines(self):
+        out = BytesIO(b'one\ntwo\rthree')
+        self.assertEqual(list(iter_lines(out, chunk_size=4)),
+                         ['one\n', 'two\r', 'three'])
+
+
+class OutputQueueTestCase(unittest.TestCase):
+
+    def test_block(self):
+        queue = OutputQueue(maxsize=0, maxbytes=8)
+        queue.put('12345')
+        self.assertRaises(Full, queue.put, '6789', timeout=0.01)
+        self.assertRaises(Full, queue.put_nowait, '6789')
+        self.assertEqual(queue.get(), '12345')
+        queue.put('6789')
+        self.assertEqual(queue.bytes, 4)
+        self.assertEqual(queue.dropped_lines, 0)
+
+    def test_drop_oldest(self):
+        queue = OutputQueue(maxsize=2, policy=DROP_OLDEST)
+        for line in ['a\n', 'bb\n', 'ccc\n']:
+            queue.put(line)
+        self.assertEqual([queue.get(), queue.get()], ['bb\n', 'ccc\n'])
+        self.assertEqual((queue.dropped_lines, queue.dropped_bytes), (1, 2))
+
+    def test_drop_oldest_bytes(self):
+        queue = OutputQueue(maxbytes=6, policy=DROP_OLDEST)
+        for line in ['abc', 'def', 'ghijklmn']:
+            queue.put(line)
+        self.assertEqual(queue.qsize(), 1)
+        self.assertEqual(queue.get(), 'ghijklmn')
+        self.assertEqual(queue.dropped_bytes, 6)
+
+    def test_discard(self):
+        queue = OutputQueue(policy=DISCARD)
+        queue.put('line\n')
+        self.assertTrue(queue.empty())
+        self.assertEqual((queue.dropped_lines, queue.dropped_bytes), (1, 5))
+
+    def test_unknown_policy(self):
+        self.assertRaises(ValueError, OutputQueue, policy='ignore')
+
+    def test_process_tail(self):
+        process = FFmpegProcess(['ffmpeg'], policy=DISCARD, tail=2)
+        process.process = Mock()
+        stdout = BytesIO(b'one\ntwo\nthree\n')
+        with patch('ffmpegwrapper.ffmpeg.wait_with_usage',
+                   return_value=(None, (None, None))):
+            process._queue_output(stdout, process.queue)
+        self.assertEqual(list(process.tail), ['two\n', 'three\n'])
+        self.assertEqual(process.queue.dropped_lines, 3)
+
+
+def make_script(testcase, code):
+    """Write an executable python script which is removed after the
+    test and return its path."""
+    with tempfile.NamedTemporaryFile('w', suffix='.py',
+                                     delete=False) as script:
+        script.write('#!%s\n%s' % (sys.executable, code))
+    os.chmod(script.name, 0o755)
+    testcase.addCleanup(os.remove, script.name)
+    return script.name
+
+
+PROGRESS_SCRIPT = """
+import os, sys, time
+fd = int(sys.argv[sys.argv.index('-progress') + 1][len('pipe:'):])
+with os.fdopen(fd, 'w') as progress:
+    progress.write('frame=10\\nfps=25.0\\nprogress=continue\\n')
+    progress.write('frame=20\\nspeed=2.5x\\nprogress=end\\n')
+sys.stderr.write('log line\\n')
+time.sleep(0.2)
+"""
+
+
+class ProgressTestCase(unittest.TestCase):
+
+    def test_parser(self):
+        parser = ProgressParser()
+        lines = ['frame=25\n', 'fps=24.5\n', 'out_time_ms=1000000\n',
+                 'bitrate= 838.9kbits/s\n', 'total_size=N/A\n',
+                 'speed=1.5x\n']
+        for line in lines:
+            self.assertEqual(parser.feed(line), None)
+        self.assertEqual(parser.feed('progress=continue\n'), ProgressEvent(
+            frame=25, fps=24.5, out_time_us=1000000, bitrate=838.9,
+            speed=1.5, total_size=None, end=False))
+        event = parser.feed('progress=end\n')
+        self.assertEqual(event.frame, None)
+        self.assertTrue(event.end)
+
+    @unittest.skipIf(os.name != 'posix' or sys.version_info < (3, 2),
+                     'progress pipe requires pass_fds')
+    def test_readprogress(self):
+        binary = make_script(self, PROGRESS_SCRIPT)
+        process = FFmpeg(binary).run(progress=True)
+        self.assertEqual(process.command[0], binary)
+        events = list(process.readprogress())
+        self.assertEqual([event.frame for event in events], [10, 20])
+        self.assertEqual(events[1].speed, 2.5)
+        self.assertEqual(process.last_progress, events[1])
+        self.assertEqual(list(process.readlines()), ['log line'])
+
+    def test_readprogress_disabled(self):
+        process = FFmpegProcess(['ffmpeg'])
+        self.assertRaises(ValueError, process.readprogress)
+
+
+FAKE_FFMPEG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'fake_ffmpeg.py')
+
+
+class FakeFFmpegTestCase(unittest.TestCase):
+
+    def test_wait(self):
+        input = Input('/old.mkv', Parameter('-fake_lines', '3'),
+                      Parameter('-fake_rate', '20'))
+        process = FFmpeg(FAKE_FFMPEG, input, Output('/new.mp4')).run()
+        self.assertEqual(process.wait(0.01), None)
+        self.assertFalse(process.finished.is_set())
+        self.assertEqual(process.wait(), 0)
+        lines = list(process.readlines())
+        self.assertEqual(len([line for line in lines
+                              if line.startswith('frame=')]), 3)
+        self.assertTrue(lines[-1].startswith('video:'))
+        self.assertEqual(list(process.readlines()), [])
+
+    def fake_frames(self):
+        input = Input('/old.mkv', Parameter('-fake_lines', '2'),
+                      Parameter('-fake_frames', '3'),
+                      Parameter('-fake_frame_size', '1000'))
+        return FFmpeg(FAKE_FFMPEG, input, Output('pipe:1'))
+
+    def test_readchunks(self):
+        process = self.fake_frames().run(stdout=PIPE)
+        data = b''.join(bytes(chunk) for chunk in process.readchunks())
+        self.assertEqual(data, b'\x80' * 3000)
+        self.assertEqual(process.wait(), 0)
+        lines = list(process.readlines())
+        self.assertTrue(lines[-1].startswith('video:'))
+        self.assertRaises(ValueError, self.fake_frames().run().readchunks)
+
+    def test_stdout_sink(self):
+        sink = BytesIO()
+        process = self.fake_frames().run(stdout=sink)
+        self.assertEqual(process.wait(), 0)
+        self.assertEqual(sink.getvalue(), b'\x80' * 3000)
+        self.assertEqual(process.stdout_error, None)
+
+    def test_input_source(self):
+        for source in [b'x' * 100000, BytesIO(b'x' * 100000)]:
+            input = Input(source, Parameter('-fake_lines', '0'))
+            self.assertEqual(list(input), ['-fake_lines', '0', '-i',
+                                           'pipe:0'])
+            ffmpeg = FFmpeg(FAKE_FFMPEG, input, Output('/new.mp4'))
+            self.assertTrue(ffmpeg.source is source)
+            process = ffmpeg.run()
+            self.assertEqual(process.wait(), 0)
+            self.assertTrue('read 100000 bytes from pipe:0' in
+                            list(process.readlines()))
+            self.assertEqual(process.stdin_error, None)
+        self.assertEqual(Input('/old.mkv').source, None)
+
+    def test_stats(self):
+        input = Input('/old.mkv', Parameter('-fake_lines', '50'))
+        process = FFmpeg(FAKE_FFMPEG, input, Output('/new.mp4')).run()
+        self.assertEqual(process.wait(), 0)
+        stats = process.stats
+        self.assertTrue(stats.wall_time > 0)
+        if hasattr(os, 'wait4'):
+            self.assertTrue(stats.user_time + stats.system_time > 0)
+            self.assertTrue(stats.max_rss > 1024 * 1024)
+        if os.path.exists('/proc/self/io'):
+            self.assertTrue(stats.write_bytes > 50 * 80)
+        # 50 frames at 25 fps
+        self.assertAlmostEqual(stats.speed * stats.wall_time, 2.0)
+
+    def test_stats_total(self):
+        total = StatsTotal()
+        total.add(ProcessStats(2.0, 1.0, 0.5, 1000, 10, 20, 4.0))
+        total.add(ProcessStats(1.0, None, None, None, None, None, None))
+        self.assertEqual((total.jobs, total.wall_time, total.cpu_time,
+                          total.max_rss, total.speed), (2, 3.0, 1.5, 1000,
+                                                        4.0))
+        self.assertEqual(total.as_dict()['write_bytes'], 20)
+
+    def fake_job(self, *parameters):
+        input = Input('/old.mkv', *parameters)
+        return FFmpeg(FAKE_FFMPEG, input, Output('/new.mp4'))
+
+    def test_timeout_quits(self):
+        recorder = Recorder()
+        ffmpeg = self.fake_job(Parameter('-fake_lines', '1000'),
+                               Parameter('-fake_rate', '100'))
+        process = ffmpeg.run(timeout=0.3, escalation=(5, 5),
+                             observers=[recorder])
+        self.assertEqual(process.wait(5), 0)
+        self.assertEqual(process.stop_reason, 'timeout')
+        self.assertEqual(process.stop_steps, ['quit'])
+        self.assertTrue(('stop', 'quit', 'timeout') in recorder.events)
+        self.assertTrue(process.stats.wall_time < 3)
+
+    def test_stall_escalates(self):
+        ffmpeg = self.fake_job(Parameter('-fake_stall', '30'))
+        process = ffmpeg.run(stall_timeout=0.3, escalation=(0.2, 5))
+        self.assertEqual(process.wait(5), -signal.SIGTERM)
+        self.assertEqual(process.stop_reason, 'stall')
+        self.assertEqual(process.stop_steps, ['quit', 'terminate'])
+
+        ffmpeg = self.fake_job(Parameter('-fake_stall', '30'),
+                               Parameter('-fake_term', '0'))
+        process = ffmpeg.run()
+        self.assertEqual(process.stop(0.1, 0.1), -signal.SIGKILL)
+        self.assertEqual(process.stop_steps, ['quit', 'terminate', 'kill'])
+
+    def test_stall_needs_position(self):
+        ffmpeg = self.fake_job(Parameter('-fake_lines', '30'),
+                               Parameter('-fake_rate', '20'),
+                               Parameter('-nostats', None))
+        process = ffmpeg.run(stall_timeout=0.5)
+        self.assertEqual(process.wait(5), 0)
+        self.assertEqual(process.stop_reason, None)
+        self.assertEqual(process.stop_steps, [])
+
+    def test_exit_code(self):
+        input = Input('pipe:0', Parameter('-fake_lines', '2'),
+                      Parameter('-fake_exit', '3'))
+        process = FFmpeg(FAKE_FFMPEG, input, Output('/new.mp4')).run()
+        process.write(b'frame')
+        process.close_stdin()
+        self.assertEqual(process.wait(), 3)
+        self.assertTrue(process.failed)
+
+
+def python_command(code):
+    return FFmpeg(sys.executable, ['-c', code])
+
+
+class Recorder(object):
+
+    def __init__(self):
+        self.events = []
+
+    def on_spawn(self, process):
+        self.events.append('spawn')
+
+    def on_line(self, process, line):
+        self.events.append('line')
+
+    def on_exit(self, process, returncode):
+        self.events.append(('exit', returncode, process.stats is not None))
+
+    def on_error(self, process, error):
+        self.events.append('error')
+
+    def on_stop(self, process, step, reason):
+        self.events.append(('stop', step, reason))
+
+
+class TwoPassTestCase(unittest.TestCase):
+
+    def command(self, name, *parameters):
+        video = VideoCodec('libvpx-vp9').bitrate('2M')
+        output = Output(name, video, AudioCodec('libopus'),
+                        Parameter('-b:a', '96k')).overwrite()
+        input = Input('/old.mkv', Parameter('-fake_lines', '1'),
+                      *parameters)
+        return FFmpeg(FAKE_FFMPEG, input, output)
+
+    def test_passes(self):
+        job = TwoPass(self.command('/new.webm'), '/tmp')
+        self.assertTrue(job.passlog.startswith('/tmp/ffmpeg2pass-'))
+        first = list(job.first_pass())
+        self.assertEqual(first[first.index('--'):], ['--', os.devnull])
+        for arg in ['-an', 'null', '1', job.passlog, '-speed']:
+            self.assertTrue(arg in first)
+        for arg in ['-acodec', '-b:a']:
+            self.assertFalse(arg in first)
+        second = list(job.second_pass())
+        self.assertEqual(second[:-2], list(self.command('/new.webm'))[:-2] +
+                         ['-pass', '2', '-passlogfile', job.passlog])
+        self.assertNotEqual(TwoPass(self.command('/a')).passlog,
+                            TwoPass(self.command('/a')).passlog)
+        self.assertRaises(ValueError, TwoPass, FFmpeg('ffmpeg'))
+
+    def test_submit_two_pass(self):
+        order = []
+
+        class Spawns(object):
+            def on_spawn(self, process):
+                command = process.command
+                order.append((command[command.index('-pass') + 1],
+                              command[-1]))
+
+        add_observer(Spawns())
+        self.addCleanup(metrics.observers.pop)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        ffmpegs = [self.command('/a.webm'), self.command('/b.webm'),
+                   self.command('/c.webm', Parameter('-fake_exit', '1'))]
+        with FFmpegPool(max_workers=1) as pool:
+            futures = submit_two_pass(pool, ffmpegs, directory)
+            results = [future.result() for future in futures]
+        self.assertEqual([result.returncode for result in results],
+                         [0, 0, 1])
+        self.assertEqual(order, [('1', os.devnull), ('2', '/a.webm'),
+                                 ('1', os.devnull), ('2', '/b.webm'),
+                                 ('1', os.devnull)])
+        self.assertEqual(os.listdir(directory), [])
+
+    def test_cancel_two_pass(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        ffmpegs = [self.command('/a.webm', Parameter('-fake_stall', '10')),
+                   self.command('/b.webm'), self.command('/c.webm')]
+        with FFmpegPool(max_workers=1) as pool:
+            futures = submit_two_pass(pool, ffmpegs, directory)
+            while futures[0].job.process is None:
+                time.sleep(0.01)
+            self.assertFalse(futures[0].cancel())
+            self.assertTrue(futures[1].cancel())
+            self.assertTrue(futures[1].job.cancelled())
+            self.assertTrue(futures[0].terminate())
+            self.assertNotEqual(futures[0].result().returncode, 0)
+            self.assertEqual(futures[2].result().returncode, 0)
+        self.assertTrue(futures[1].cancelled())
+        self.assertEqual(os.listdir(directory), [])
+
+
+class ThumbnailsTestCase(unittest.TestCase):
+
+    def test_modes(self):
+        thumbnails = Thumbnails(Input('/old.mkv'), INTERVAL, interval=5,
+                                size=(160, -1))
+        self.assertEqual(list(thumbnails.images('/thumb%04d.jpg')), [
+            'ffmpeg', '-i', '/old.mkv', '-an', '-vf',
+            "select='isnan(prev_selected_t)+gte(t-prev_selected_t,5)',"
+            "showinfo,scale=160:-1", '-vsync', 'vfr', '-y', '--',
+            '/thumb%04d.jpg'])
+        thumbnails = Thumbnails(Input('/old.mkv'), SCENE, threshold=0.3,
+                                size=(160, 90))
+        self.assertEqual(list(thumbnails.sprite('/sprite.jpg', 5, 4))[3:], [
+            '-an', '-vf', "select='gt(scene,0.3)',showinfo,scale=160:90,"
+            "tile=5x4", '-vsync', 'vfr', '-frames:v', '1', '-y', '--',
+            '/sprite.jpg'])
+        thumbnails = Thumbnails(Input('/old.mkv'), KEYFRAMES)
+        self.assertEqual(list(thumbnails.images('/key%04d.jpg'))[:7], [
+            'ffmpeg', '-skip_frame', 'nokey', '-i', '/old.mkv', '-an',
+            '-vf'])
+        self.assertRaises(ValueError, thumbnails.sprite, '/sprite.jpg')
+        self.assertRaises(ValueError, Thumbnails, Input('/old.mkv'), 'all')
+
+    def test_vtt_timestamp(self):
+        self.assertEqual(vtt_timestamp(0), '00:00:00.000')
+        self.assertEqual(vtt_timestamp(3723.4567), '01:02:03.457')
+
+    def test_sprite_sheet(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        vtt_path = os.path.join(directory, 'sprite.vtt')
+        input = Input('/old.mkv', Parameter('-fake_lines', '300'),
+                      Parameter('-fake_showinfo', '50'))
+        thumbnails = Thumbnails(input, INTERVAL, interval=2, size=(160, 90),
+                                binary=FAKE_FFMPEG)
+        result = thumbnails.sprite_sheet(
+            os.path.join(directory, 'sprite.jpg'), vtt_path, 2, 2)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.times, [2.0, 4.0, 6.0, 8.0])
+        self.assertEqual(result.duration, 7200.0)
+        with open(vtt_path) as vtt:
+            self.assertEqual(vtt.read(), (
+                'WEBVTT\n\n'
+                '00:00:02.000 --> 00:00:04.000\nsprite.jpg#xywh=0,0,160,90\n'
+                '\n00:00:04.000 --> 00:00:06.000\n'
+                'sprite.jpg#xywh=160,0,160,90\n'
+                '\n00:00:06.000 --> 00:00:08.000\n'
+                'sprite.jpg#xywh=0,90,160,90\n'
+                '\n00:00:08.000 --> 00:00:10.000\n'
+                'sprite.jpg#xywh=160,90,160,90\n'))
+
+        result = thumbnails.sprite_sheet(
+            os.path.join(directory, 'sprite%02d.jpg'), vtt_path, 2, 2,
+            image_url='/sprites/sprite%02d.jpg')
+        self.assertEqual(len(result.times), 6)
+        with open(vtt_path) as vtt:
+            cues = vtt.read().split('\n\n')
+        self.assertEqual(cues[-1], '00:00:12.000 --> 00:00:14.000\n'
+                         '/sprites/sprite02.jpg#xywh=160,0,160,90\n')
+
+
+class TranscodeCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.input = os.path.join(self.directory, 'old.mkv')
+        with open(self.input, 'wb') as input:
+            input.write(b'video' * 1000)
+
+    def command(self, output, size=100, *parameters):
+        input = Input(self.input, Parameter('-fake_lines', '1'),
+                      Parameter('-fake_write', str(size)))
+        output = Output(os.path.join(self.directory, output), *parameters)
+        return FFmpeg(FAKE_FFMPEG, input, output)
+
+    def test_job_key(self):
+        key, outputs = job_key(self.command('a.mp4'))
+        self.assertEqual(outputs, [os.path.join(self.directory, 'a.mp4')])
+        ffmpeg = self.command('b.mp4')
+        ffmpeg.add_parameter('-y', None)
+        self.assertEqual(job_key(ffmpeg)[0], key)
+        self.assertEqual(job_key(self.command('c.MP4'))[0], key)
+        self.assertNotEqual(job_key(self.command('a.webm'))[0], key)
+        self.assertNotEqual(job_key(self.command('a.mp4', 200))[0], key)
+        self.assertEqual(job_key(self.command('%03d.jpg')), (None, None))
+        ffmpeg = FFmpeg(FAKE_FFMPEG, Input('/nonexistent.mkv'),
+                        Output('/new.mp4'))
+        self.assertEqual(job_key(ffmpeg), (None, None))
+
+    def test_run(self):
+        cache = TranscodeCache(os.path.join(self.directory, 'cache'))
+        first = cache.run(self.command('a.mp4'))
+        self.assertFalse(first.hit)
+        self.assertTrue(first.output)
+        mode = os.stat(os.path.join(self.directory, 'a.mp4')).st_mode
+        self.assertTrue(mode & stat.S_IWUSR)
+        second = cache.run(self.command('b.mp4'))
+        self.assertEqual(second, (first.key, True, 0, []))
+        with open(os.path.join(self.directory, 'b.mp4'), 'rb') as output:
+            self.assertEqual(output.read(), b'\x00' * 100)
+
+    @patch('ffmpegwrapper.cache.SAMPLE_SIZE', 100)
+    def test_fingerprint(self):
+        os.utime(self.input, (1, 1))
+        first = fingerprint(self.input)
+        with open(self.input, 'r+b') as input:
+            input.seek(1000)
+            input.write(b'edit!')
+        os.utime(self.input, (1, 1))
+        self.assertEqual(fingerprint(self.input), first)
+        os.utime(self.input, (2, 2))
+        self.assertNotEqual(fingerprint(self.input), first)
+
+    def test_evict(self):
+        cache = TranscodeCache(os.path.join(self.directory, 'cache'),
+                               max_bytes=250)
+        for size in (100, 101, 102):
+            cache.run(self.command('a.mp4', size))
+        sizes = sorted(size for _, size, _ in cache.entries())
+        self.assertEqual(sizes, [101, 102])
+
+
+class MetricsTestCase(unittest.TestCase):
+
+    def test_observers(self):
+        recorder = Recorder()
+        input = Input('/old.mkv', Parameter('-fake_lines', '2'),
+                      Parameter('-fake_exit', '1'))
+        ffmpeg = FFmpeg(FAKE_FFMPEG, input, Output('/new.mp4'))
+        ffmpeg.run(observers=[recorder]).wait()
+        self.assertEqual(recorder.events[0], 'spawn')
+        self.assertEqual(recorder.events[-1], ('exit', 1, True))
+        self.assertTrue(recorder.events.count('line') > 2)
+
+        self.assertRaises(OSError, FFmpeg('/nonexistent/ffmpeg').run,
+                          observers=[recorder])
+        self.assertEqual(recorder.events[-1], 'error')
+
+    def test_metrics_observer(self):
+        registry = MetricsRegistry()
+        observer = MetricsObserver(registry)
+        add_observer(observer)
+        self.addCleanup(remove_observer, observer)
+        input = Input('/old.mkv', Parameter('-fake_lines', '0'))
+        FFmpeg(FAKE_FFMPEG, input, Output('/new.mp4')).run().wait()
+        self.assertEqual(observer.started.value, 1)
+        self.assertEqual(observer.finished.value, 1)
+        self.assertEqual(observer.active.value, 0)
+        self.assertEqual(observer.duration.count, 1)
+        self.assertEqual(observer.queue_wait.count, 0)
+
+    def test_exposition(self):
+        registry = MetricsRegistry()
+        registry.counter('jobs_total', 'Jobs').inc(2)
+        registry.histogram('wait_seconds', buckets=(1, 10)).observe(5)
+        self.assertEqual(registry.exposition(), '\n'.join([
+            '# HELP jobs_total Jobs',
+            '# TYPE jobs_total counter',
+            'jobs_total 2',
+            '# TYPE wait_seconds histogram',
+            'wait_seconds_bucket{le="1"} 0',
+            'wait_seconds_bucket{le="10"} 1',
+            'wait_seconds_bucket{le="+Inf"} 1',
+            'wait_seconds_sum 5',
+            'wait_seconds_count 1', '']))
+        self.assertRaises(ValueError, registry.gauge, 'jobs_total')
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'ffmpeg.prom')
+        registry.write(path)
+        with open(path) as prom:
+            self.assertEqual(prom.read(), registry.exposition())
+
+        server = registry.serve(0, '127.0.0.1')
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = 'http://127.0.0.1:%d/metrics' % server.server_address[1]
+        self.assertEqual(urlopen(url).read().decode('utf8'),
+                         registry.exposition())
+
+
+@unittest.skipIf(sys.version_info < (3, 6), 'asyncio backend requires 3.6')
+class AsyncFFmpegTestCase(unittest.TestCase):
+
+    def setUp(self):
+        import asyncio
+        self.loop = asyncio.new_event_loop()
+
+    def collect(self, lines):
+        result = []
+        while True:
+            try:
+                result.append(self.loop.run_until_complete(lines.__anext__()))
+            except StopAsyncIteration:
+                return result
+
+    def test_run_async(self):
+        ffmpeg = python_command('import sys; sys.stderr.write("a\\nb\\r")')
+        process = self.loop.run_until_complete(ffmpeg.run_async())
+        self.assertEqual(self.collect(process.readlines()), ['a', 'b'])
+        self.assertEqual(self.loop.run_until_complete(process.wait()), 0)
+        self.assertTrue(process.successful)
+
+    def test_write(self):
+        ffmpeg = python_command(COUNT_SCRIPT)
+        process = self.loop.run_until_complete(ffmpeg.run_async())
+        self.loop.run_until_complete(process.write(b'abc'))
+        self.loop.run_until_complete(process.write(bytearray(2)))
+        process.close_stdin()
+        self.assertEqual(self.collect(process.readlines()), ['5 bytes'])
+
+    def test_async_source(self):
+        loop = self.loop
+
+        class Chunks(object):
+            def __init__(self, chunks):
+                self.chunks = iter(chunks)
+
+            def __aiter__(self):
+                return self
+
+            def __anext__(self):
+                future = loop.create_future()
+                try:
+                    future.set_result(next(self.chunks))
+                except StopIteration:
+                    future.set_exception(StopAsyncIteration())
+                return future
+
+        input = Input(Chunks([b'abc', b'de']))
+        ffmpeg = FFmpeg(FAKE_FFMPEG, Parameter('-fake_lines', '0'), input,
+                        Output('/new.mp4'))
+        process = loop.run_until_complete(ffmpeg.run_async())
+        self.assertTrue('read 5 bytes from pipe:0' in
+                        self.collect(process.readlines()))
+        self.assertEqual(loop.run_until_complete(process.wait()), 0)
+        self.assertRaises(ValueError, ffmpeg.run)
+
+    def test_cancel_terminates(self):
+        import asyncio
+        ffmpeg = python_command('import time; time.sleep(30)')
+        process = self.loop.run_until_complete(ffmpeg.run_async())
+        task = self.loop.create_task(process.wait())
+        self.loop.call_later(0.1, task.cancel)
+        self.assertRaises(asyncio.CancelledError,
+                          self.loop.run_until_complete, task)
+        self.loop.run_until_complete(process.process.wait())
+        self.assertTrue(process.failed)
+
+    def tearDown(self):
+        self.loop.close()
+
+
+class FFmpegPoolTestCase(unittest.TestCase):
+
+    def test_command(self):
+        pool = FFmpegPool(max_workers=1, threads_per_job=2)
+        self.addCleanup(pool.shutdown)
+        ffmpeg = FFmpeg('ffmpeg', Input('/old'), Output('/new'))
+        ffmpeg.add_parameter('-y', None)
+        self.assertEqual(pool.command(ffmpeg), [
+            'ffmpeg', '-y', '-threads', '2', '-i', '/old',
+            '-threads', '2', '--', '/new'])
+
+    def test_map(self):
+        codes = [python_command('print(%d); raise SystemExit(%d)' % (i, i))
+                 for i in range(4)]
+        with FFmpegPool(max_workers=2) as pool:
+            results = list(pool.map(codes))
+        self.assertEqual([result.returncode for result in results],
+                         [0, 1, 2, 3])
+        self.assertEqual([result.output for result in results],
+                         [['0'], ['1'], ['2'], ['3']])
+        self.assertEqual(pool.stats.jobs, 4)
+        self.assertTrue(results[0].stats.wall_time > 0)
+
+    def test_priority_and_cancel(self):
+        started = []
+        with FFmpegPool(max_workers=1) as pool:
+            sleep = python_command('import time; time.sleep(30)')
+            blocker = pool.submit(sleep)
+            low = pool.submit(python_command('pass'), priority=5)
+            high = pool.submit(python_command('pass'), priority=1)
+            cancelled = pool.submit(python_command('pass'))
+            for future in (low, high):
+                future.add_done_callback(started.append)
+            self.assertTrue(cancelled.cancel())
+            while blocker.process is None:
+                pass
+            self.assertTrue(blocker.terminate())
+        self.assertNotEqual(blocker.result().returncode, 0)
+        self.assertEqual(started, [high, low])
+        self.assertTrue(cancelled.cancelled())
+
+
+PROBE_OUTPUT = b"""{
+    "streams": [
+        {"index": 0, "codec_type": "video", "codec_name": "h264",
+         "width": 1920, "height": 1080, "avg_frame_rate": "30000/1001"},
+        {"index": 1, "codec_type": "audio", "codec_name": "aac",
+         "sample_rate": "48000", "channels": 2}
+    ],
+    "format": {"filename": "/old.mp4", "duration": "7200.5",
+               "size": "1024", "tags": {"title": "Old"}}
+}"""
+
+
+class ProbeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.patcher = patch('ffmpegwrapper.probe.check_output')
+        self.check_output = self.patcher.start()
+        self.check_output.return_value = PROBE_OUTPUT
+        self.workdir = tempfile.mkdtemp()
+        self.media = os.path.join(self.workdir, 'old.mp4')
+        with open(self.media, 'wb') as media:
+            media.write(b'data')
+
+    def test_probe(self):
+        result = probe(self.media, cache=None)
+        self.assertEqual(result.duration, 7200.5)
+        self.assertEqual(result.format.tags, {'title': 'Old'})
+        video, = result.video_streams
+        self.assertEqual((video.width, video.height), (1920, 1080))
+        self.assertAlmostEqual(video.avg_frame_rate, 29.97, places=2)
+        audio, = result.audio_streams
+        self.assertEqual((audio.sample_rate, audio.channels), (48000, 2))
+        self.assertEqual(audio.width, None)
+
+    def test_cache(self):
+        cache = ProbeCache(maxsize=1)
+        first = probe(self.media, cache=cache)
+        self.assertTrue(probe(self.media, cache=cache) is first)
+        self.assertEqual(self.check_output.call_count, 1)
+
+        with open(self.media, 'ab') as media:
+            media.write(b'more')
+        probe(self.media, cache=cache)
+        self.assertEqual(self.check_output.call_count, 2)
+        self.assertEqual(len(cache), 1)
+
+    def test_database(self):
+        path = os.path.join(self.workdir, 'probe.sqlite')
+        probe(self.media, cache=ProbeCache(path=path))
+        result = probe(self.media, cache=ProbeCache(path=path))
+        self.assertEqual(self.check_output.call_count, 1)
+        self.assertEqual(result.duration, 7200.5)
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.workdir)
+
+
+PACKETS_OUTPUT = b"""0.080000,0.000000,48,K_
+0.160000,0.040000,9000,__
+10.080000,10.000000,524288,K_
+N/A,N/A,N/A,__
+N/A,20.000000,N/A,K_
+"""
+
+
+class KeyframeIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.patcher = patch('ffmpegwrapper.keyframes.Popen')
+        self.popen = self.patcher.start()
+        self.popen.return_value.wait.return_value = 0
+        self.popen.return_value.stdout = BytesIO(PACKETS_OUTPUT)
+        self.workdir = tempfile.mkdtemp()
+        self.media = os.path.join(self.workdir, 'old.mp4')
+        with open(self.media, 'wb') as media:
+            media.write(b'data')
+
+    def test_scan(self):
+        index = scan_keyframes(self.media)
+        self.assertEqual(list(index), [0.08, 10.08, 20.0])
+        self.assertEqual(list(index.offsets), [48, 524288, -1])
+        self.assertEqual(index.before(15), 10.08)
+        self.assertEqual(index.before(0), None)
+        self.assertEqual(index.after(10.1), 20.0)
+        self.assertEqual(index.after(21), None)
+        self.assertEqual(index.nearest(16), 20.0)
+        self.assertEqual(index.offset(12), 524288)
+        self.assertEqual(index.offset(25), None)
+        self.assertEqual(KeyframeIndex().nearest(1), None)
+
+        self.popen.return_value.stdout = BytesIO(PACKETS_OUTPUT)
+        self.popen.return_value.wait.return_value = 1
+        self.assertRaises(CalledProcessError, scan_keyframes, self.media)
+
+    def test_cache(self):
+        directory = os.path.join(self.workdir, 'index')
+        first = keyframe_index(self.media,
+                               cache=KeyframeIndexCache(directory=directory))
+        cache = KeyframeIndexCache(directory=directory)
+        second = keyframe_index(self.media, cache=cache)
+        self.assertEqual(self.popen.call_count, 1)
+        self.assertEqual(second.times, first.times)
+        self.assertEqual(second.offsets, first.offsets)
+        self.assertTrue(keyframe_index(self.media, cache=cache) is second)
+
+        with open(self.media, 'ab') as media:
+            media.write(b'more')
+        self.popen.return_value.stdout = BytesIO(PACKETS_OUTPUT)
+        keyframe_index(self.media, cache=cache)
+        self.assertEqual(self.popen.call_count, 2)
+        self.assertEqual(len(os.listdir(directory)), 1)
+        cache.clear()
+        self.assertEqual(os.listdir(directory), [])
+
+    def test_seek_and_plan(self):
+        index = KeyframeIndex([0.0, 28.0, 33.0, 70.0])
+        self.assertEqual(plan_segments(90, 3, index),
+                         [(0.0, 28.0), (28.0, 42.0), (70.0, 20.0)])
+        output = Output('/new')
+        input = Input('/old').seek(40, output, keyframes=index)
+        self.assertEqual(list(input)[:2], ['-ss', '33.0'])
+        self.assertEqual(list(output)[:2], ['-ss', '7.0'])
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.workdir)
+
+
+FRAMES_SCRIPT = """
+import sys
+sys.stderr.write('decoding\\n')
+sys.stdout.buffer.write(bytes(range(6 * 3)) + b'part')
+"""
+
+ECHO_SCRIPT = """
+import sys
+sys.stdout.buffer.write(sys.stdin.buffer.read())
+"""
+
+
+@unittest.skipIf(numpy is None, 'FrameReader requires numpy')
+class FrameReaderTestCase(unittest.TestCase):
+
+    def test_command(self):
+        reader = FrameReader(Input('/old'), (320, 240), 'gray',
+                             [VideoFilter().hflip()])
+        self.assertEqual(list(reader.command), [
+            'ffmpeg', '-i', '/old', '-vf', 'hflip', '-f', 'rawvideo',
+            '-pix_fmt', 'gray', '-s', '320x240', '-an', '--', 'pipe:1'])
+        self.assertEqual(reader.frame_shape, (240, 320, 1))
+        self.assertRaises(ValueError, FrameReader, Input('/old'),
+                          (320, 240), 'yuv420p')
+
+    def test_frames(self):
+        binary = make_script(self, FRAMES_SCRIPT)
+        reader = FrameReader(Input('/old'), (2, 1), binary=binary)
+        frames = [frame.copy() for frame in reader]
+        self.assertEqual(len(frames), 3)
+        self.assertEqual(frames[0].shape, (1, 2, 3))
+        self.assertEqual(frames[2].tolist(), [[[12, 13, 14], [15, 16, 17]]])
+        self.assertEqual(reader.returncode, 0)
+        self.assertEqual(list(reader.errors), ['decoding'])
+
+    def test_batches(self):
+        binary = make_script(self, FRAMES_SCRIPT)
+        reader = FrameReader(Input('/old'), (2, 1), binary=binary,
+                             batch_size=2, buffers=1)
+        batches = [batch.shape for batch in reader]
+        self.assertEqual(batches, [(2, 1, 2, 3), (1, 1, 2, 3)])
+
+    def test_source(self):
+        binary = make_script(self, ECHO_SCRIPT)
+        reader = FrameReader(Input(bytes(bytearray(range(12)))), (2, 1),
+                             binary=binary)
+        frames = [frame.tolist() for frame in reader]
+        self.assertEqual(frames[1], [[[6, 7, 8], [9, 10, 11]]])
+        self.assertEqual(reader.stdin_error, None)
+        self.assertEqual(reader.returncode, 0)
+
+
+COUNT_SCRIPT = """
+import sys
+sys.stderr.write('%d bytes\\n' % len(sys.stdin.buffer.read()))
+"""
+
+
+class FrameWriterTestCase(unittest.TestCase):
+
+    def test_command(self):
+        writer = FrameWriter(Output('/new'), (320, 240), 'gray16le', 30)
+        self.assertEqual(list(writer.command), [
+            'ffmpeg', '-f', 'rawvideo', '-pix_fmt', 'gray16le',
+            '-s', '320x240', '-r', '30', '-i', 'pipe:0', '--', '/new'])
+        self.assertEqual(writer.frame_size, 320 * 240 * 2)
+
+    def test_write(self):
+        binary = make_script(self, COUNT_SCRIPT)
+        with FrameWriter(Output('/new'), (2, 1), binary=binary) as writer:
+            writer.write(b'\x00' * 6)
+            writer.write(bytearray(12))
+            self.assertRaises(ValueError, writer.write, b'\x00' * 5)
+        self.assertTrue(writer.process.successful)
+        self.assertEqual(list(writer.process.readlines()), ['18 bytes'])
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_write_array(self):
+        binary = make_script(self, COUNT_SCRIPT)
+        frames = numpy.zeros((1, 4, 3), 'u1')
+        with FrameWriter(Output('/new'), (2, 1), binary=binary) as writer:
+            writer.write(frames[:, ::2])
+            writer.write(frames)
+        self.assertEqual(list(writer.process.readlines()), ['18 bytes'])
+
+
+class SegmentTestCase(unittest.TestCase):
+
+    def test_plan_segments(self):
+        self.assertEqual(plan_segments(90, 3),
+                         [(0.0, 30.0), (30.0, 30.0), (60.0, 30.0)])
+        self.assertEqual(plan_segments(90, 3, [0.0, 28.0, 33.0, 70.0]),
+                         [(0.0, 28.0), (28.0, 42.0), (70.0, 20.0)])
+        self.assertEqual(plan_segments(90, 3, [0.0]), [(0.0, 90.0)])
+
+    def test_plan_without_duration(self):
+        transcode = SegmentedTranscode(Input('/old.ts'), Output('/new.mp4'),
+                                       segments=2)
+        with patch('ffmpegwrapper.segment.probe') as probe, \
+                patch('ffmpegwrapper.segment.keyframe_index') as index:
+            probe.return_value.duration = None
+            index.return_value = [0.0, 4.0]
+            self.assertRaises(ValueError, transcode.plan)
+            self.assertEqual(transcode.plan(10),
+                             [(0.0, 4.0), (4.0, 6.0)])
+
+    def test_commands(self):
+        output = Output('/new.mp4', VideoCodec('libx264')).overwrite()
+        transcode = SegmentedTranscode(Input('/old'), output,
+                                       codecs=[AudioCodec('aac')])
+        first, second = transcode.commands([(0.0, 5.0), (5.0, 5.0)], '/tmp')
+        self.assertEqual(list(second), [
+            'ffmpeg', '-ss', '5.0', '-t', '5.0', '-i', '/old',
+            '-vcodec', 'libx264', '-y', '-acodec', 'aac',
+            '--', '/tmp/segment00001.mp4'])
+
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        list_path = os.path.join(workdir, 'segments.txt')
+        concat = transcode.concat_command(['/tmp/a.mp4', "/tmp/b'.mp4"],
+                                          list_path)
+        self.assertEqual(list(concat), [
+            'ffmpeg', '-f', 'concat', '-safe', '0', '-i', list_path,
+            '-c', 'copy', '-y', '--', '/new.mp4'])
+        with open(list_path) as segment_list:
+            self.assertEqual(segment_list.read(),
+                             "file '/tmp/a.mp4'\nfile '/tmp/b'\\''.mp4'\n")
+
+
 class VideoFilterTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -143,6 +1218,11 @@ class VideoFilterTestCase(unittest.TestCase):
         self.assertEqual(list(self.filter),
             self.prefix('format=yuv420p'))
 
+    def test_fps(self):
+        self.filter.fps('1/10')
+        self.assertEqual(list(self.filter),
+            self.prefix('fps=1/10'))
+
     def test_freior(self):
         self.filter.freior('distort0r', 0.5, 0.01)
         self.assertEqual(list(self.filter),
@@ -208,6 +1288,11 @@ class VideoFilterTestCase(unittest.TestCase):
         self.assertEqual(list(self.filter),
             self.prefix('setsar=16:9'))
 
+    def test_split(self):
+        self.filter.split(3)
+        self.assertEqual(list(self.filter),
+            self.prefix('split=3'))
+
     def test_slicify(self):
         self.filter.slicify(20)
         self.assertEqual(list(self.filter),
@@ -234,6 +1319,93 @@ class VideoFilterTestCase(unittest.TestCase):
             self.prefix('yadif=0:-1'))
 
 
+class AudioFilterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filter = AudioFilter()
+
+    def test_amix(self):
+        self.filter.amix(3, 'longest')
+        self.assertEqual(list(self.filter), ['-af', 'amix=3:longest'])
+
+    def test_asplit(self):
+        self.filter.asplit()
+        self.assertEqual(list(self.filter), ['-af', 'asplit=2'])
+
+
+class FilterGraphTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = FilterGraph()
+
+    def test_renditions(self):
+        graph = self.graph
+        big, small = graph.split(graph.stream('0:v'))
+        small = graph.filter(small, VideoFilter().scale(640, -1),
+                             labels=['small'])
+        logo = graph.overlay(big, graph.stream('1:v'), 10, 10)
+        mixed = graph.amix(graph.stream('0:a'), graph.stream('1:a'),
+                           duration='first')
+        ffmpeg = FFmpeg('ffmpeg', Input('/old'), Input('/logo'), graph,
+                        Output('/big', graph.map(logo), graph.map(mixed)),
+                        Output('/small', graph.map(small)))
+        self.assertEqual(list(ffmpeg), [
+            'ffmpeg', '-i', '/old', '-i', '/logo', '-filter_complex',
+            '[0:v]split=2[p0][p1];[p1]scale=640:-1[small];'
+            '[p0][1:v]overlay=10:10[p2];[0:a][1:a]amix=2:first[p3]',
+            '-map', '[p2]', '-map', '[p3]', '--', '/big',
+            '-map', '[small]', '--', '/small'])
+
+    def test_validation(self):
+        graph = self.graph
+        first, second = graph.split(graph.stream('0:v'))
+        self.assertRaises(ValueError, graph.split, FilterGraph().stream('0'))
+        graph.map(first)
+        self.assertRaises(ValueError, graph.map, first)
+        self.assertRaises(ValueError, list, graph)
+        self.assertRaises(ValueError, graph.filter, second,
+                          VideoFilter().hflip(), labels=['p0'])
+        graph.map(second)
+        self.assertEqual(list(graph)[0], '-filter_complex')
+
+
+class LadderTestCase(unittest.TestCase):
+
+    def test_command(self):
+        ladder = Ladder(Input('/old'), AudioCodec('aac'))
+        ladder.add_rendition('/720.mp4', VideoCodec('libx264'),
+                             (1280, 720), '3000k')
+        ladder.add_rendition('/360.mp4', VideoCodec('libx264'),
+                             (640, 360), '800k')
+        ladder.add_rendition('/360.ts', VideoCodec('libx264'),
+                             (640, 360), '800k')
+        ladder.add_thumbnails('/thumb%04d.jpg', 10, (160, 90))
+        ladder.add_audio_output('/audio.m4a', AudioCodec('aac'))
+        self.assertEqual(list(ladder.command()), [
+            'ffmpeg', '-i', '/old', '-filter_complex',
+            '[0:v]split=3[p0][p1][p2];[p0]scale=1280:720[p3];'
+            '[p1]scale=640:360[p4];[p2]fps=1/10,scale=160:90[p5]',
+            '-map', '[p3]', '-vcodec', 'libx264', '-b:v', '3000k',
+            '-map', '0:a?', '-acodec', 'aac', '--', '/720.mp4',
+            '-map', '[p4]', '-vcodec', 'libx264', '-b:v', '800k',
+            '-map', '0:a?', '-acodec', 'aac', '-flags', '+global_header',
+            '-f', 'tee',
+            '--', '/360.mp4|/360.ts',
+            '-map', '[p5]', '--', '/thumb%04d.jpg',
+            '-map', '0:a', '-acodec', 'aac', '--', '/audio.m4a'])
+
+    def test_single_rendition(self):
+        ladder = Ladder(Input('/old'))
+        ladder.add_rendition('/360.mp4', VideoCodec('libx264'),
+                             (640, 360), '800k')
+        self.assertEqual(list(ladder.command())[3:6],
+                         ['-filter_complex', '[0:v]scale=640:360[p0]',
+                          '-map'])
+        self.assertEqual(list(ladder.command())[-4:],
+                         ['800k', '-an', '--', '/360.mp4'])
+        self.assertRaises(ValueError, Ladder(Input('/old')).command)
+
+
 class VideoCodecTestCase(unittest.TestCase):
 
     def setUp(self):